@@ -3,7 +3,18 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 """prefpicker module"""
 
-from .prefpicker import PrefPicker, SourceDataError
+from .compact import AssignmentEncoder, CompactAssignment
+from .prefpicker import Pref, PrefPicker, SourceDataError
+from .prefsjs import Assignment, read_prefsjs, read_prefsjs_files
 
-__all__ = ("PrefPicker", "SourceDataError")
+__all__ = (
+    "Assignment",
+    "AssignmentEncoder",
+    "CompactAssignment",
+    "Pref",
+    "PrefPicker",
+    "SourceDataError",
+    "read_prefsjs",
+    "read_prefsjs_files",
+)
 __author__ = "Tyson Smith"
@@ -0,0 +1,125 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""asyncio support"""
+
+from __future__ import annotations
+
+from asyncio import Semaphore, get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from types import TracebackType
+
+    from .prefpicker import PrefPicker
+
+__author__ = "Tyson Smith"
+__credits__ = ["Tyson Smith"]
+
+
+class AsyncPrefPicker:
+    """Generate prefs.js files from asyncio code without blocking the event loop.
+    Values are picked and rendered in memory and the file is written in a single
+    call using a bounded thread pool. The number of pending writes is limited,
+    callers wait when the limit is reached.
+    """
+
+    __slots__ = ("_executor", "_pending", "picker")
+
+    def __init__(
+        self,
+        picker: PrefPicker,
+        max_workers: int = 4,
+        max_pending: int | None = None,
+    ) -> None:
+        assert max_workers > 0
+        assert max_pending is None or max_pending > 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="prefpicker"
+        )
+        self._pending = Semaphore(max_pending or max_workers * 2)
+        self.picker = picker
+
+    async def __aenter__(self) -> AsyncPrefPicker:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Wait for pending writes and shutdown the thread pool without blocking
+        the event loop.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        await get_running_loop().run_in_executor(None, self.close)
+
+    def close(self) -> None:
+        """Wait for pending writes and shutdown the thread pool. This blocks, use
+        aclose() from a coroutine.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._executor.shutdown(wait=True)
+
+    async def create_prefsjs(
+        self,
+        dest: Path,
+        variant: str = "default",
+        additional_prefs: dict[str, Any] | None = None,
+    ) -> None:
+        """Write a `prefs.js` file. See PrefPicker.create_prefsjs().
+
+        Args:
+            dest: Path of file to create.
+            variant: Used to pick the values to output.
+            additional_prefs: Additional preferences to include in the output.
+
+        Returns:
+            None
+        """
+        async with self._pending:
+            data = self.picker.render(
+                self.picker.select(variant), variant, additional_prefs
+            )
+            await get_running_loop().run_in_executor(
+                self._executor, dest.write_text, data
+            )
+
+
+async def async_create_prefsjs(
+    picker: PrefPicker,
+    dest: Path,
+    variant: str = "default",
+    additional_prefs: dict[str, Any] | None = None,
+) -> None:
+    """Write a `prefs.js` file using the default executor of the running event
+    loop. See PrefPicker.create_prefsjs(). Use AsyncPrefPicker to limit the
+    number of concurrent writes.
+
+    Args:
+        picker: PrefPicker to use.
+        dest: Path of file to create.
+        variant: Used to pick the values to output.
+        additional_prefs: Additional preferences to include in the output.
+
+    Returns:
+        None
+    """
+    data = picker.render(picker.select(variant), variant, additional_prefs)
+    await get_running_loop().run_in_executor(None, dest.write_text, data)
@@ -0,0 +1,333 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""prefpicker review_on_close bug status checks"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from json import JSONDecodeError, dumps, loads
+from logging import getLogger
+from os import getenv
+from pathlib import Path
+from threading import Lock, local
+from typing import TYPE_CHECKING
+from urllib.parse import urlencode, urlsplit
+
+from .main import check_minimum, find_template, load_picker
+from .prefpicker import PrefPicker, SourceDataError
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable, Mapping
+    from types import TracebackType
+
+__author__ = "Tyson Smith"
+__credits__ = ["Tyson Smith"]
+
+LOG = getLogger(__name__)
+
+API_KEY_ENV = "BUGZILLA_API_KEY"
+BUGZILLA_URL = "https://bugzilla.mozilla.org"
+CLOSED_STATUSES = frozenset(("CLOSED", "RESOLVED", "VERIFIED"))
+
+
+def closed_bugs(
+    picker: PrefPicker, statuses: Mapping[int, str]
+) -> Generator[tuple[int, str, list[str]]]:
+    """Find closed bugs in the review_on_close index of a template.
+
+    Args:
+        picker: PrefPicker to check.
+        statuses: Status of each bug.
+
+    Yields:
+        Bug number, status and prefs to review.
+    """
+    for bug, prefs in sorted(picker.review_on_close.items()):
+        status = statuses.get(bug)
+        if status in CLOSED_STATUSES:
+            yield (bug, status, prefs)
+
+
+def load_snapshot(path: Path) -> dict[int, str]:
+    """Load bug statuses from a snapshot file. The file can contain a Bugzilla
+    REST API response ({"bugs": [{"id": 1, "status": "NEW"}, ...]}) or a map of
+    bug number to status.
+
+    Args:
+        path: Snapshot file.
+
+    Returns:
+        Status of each bug in the snapshot.
+    """
+    try:
+        data = loads(path.read_bytes())
+    except (JSONDecodeError, UnicodeDecodeError):
+        raise SourceDataError("invalid snapshot JSON") from None
+    try:
+        if isinstance(data, dict) and isinstance(data.get("bugs"), list):
+            return {int(x["id"]): str(x["status"]) for x in data["bugs"]}
+        if isinstance(data, dict):
+            return {int(bug): str(status) for bug, status in data.items()}
+    except (KeyError, TypeError, ValueError):
+        pass
+    raise SourceDataError("invalid snapshot")
+
+
+def save_snapshot(path: Path, statuses: Mapping[int, str]) -> None:
+    """Save bug statuses to a snapshot file (see load_snapshot()).
+
+    Args:
+        path: Snapshot file to create.
+        statuses: Status of each bug.
+
+    Returns:
+        None
+    """
+    path.write_text(
+        dumps(
+            {"bugs": [{"id": x, "status": statuses[x]} for x in sorted(statuses)]},
+            indent=2,
+        )
+    )
+
+
+class BugzillaFetcher:
+    """Fetch bug statuses using the Bugzilla REST API. Bugs are requested in
+    batches by a limited number of threads, each thread reuses its own HTTP
+    connection. Bugs that are not accessible are not included in the results.
+    Instances are callable, any callable that takes bug numbers and returns a
+    map of bug number to status can be used in its place.
+    """
+
+    __slots__ = (
+        "_connections",
+        "_executor",
+        "_local",
+        "_lock",
+        "api_key",
+        "batch",
+        "concurrency",
+        "timeout",
+        "url",
+    )
+
+    def __init__(
+        self,
+        url: str = BUGZILLA_URL,
+        api_key: str | None = None,
+        batch: int = 200,
+        concurrency: int = 4,
+        timeout: float = 30,
+    ) -> None:
+        assert batch > 0
+        assert concurrency > 0
+        self.url = urlsplit(url)
+        if self.url.scheme not in ("http", "https") or not self.url.netloc:
+            raise ValueError(f"invalid url {url!r}")
+        self._connections: list[HTTPConnection] = []
+        # worker threads (and their connections) are kept until close() is called
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="prefpicker-bugs"
+        )
+        self._local = local()
+        self._lock = Lock()
+        self.api_key = api_key
+        self.batch = batch
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def __call__(self, bugs: Iterable[int]) -> dict[int, str]:
+        """Fetch the status of bugs.
+
+        Args:
+            bugs: Bugs to look up.
+
+        Returns:
+            Status of each accessible bug.
+        """
+        ordered = sorted(set(bugs))
+        batches = [
+            ordered[i : i + self.batch] for i in range(0, len(ordered), self.batch)
+        ]
+        statuses: dict[int, str] = {}
+        for result in self._executor.map(self._fetch, batches):
+            statuses.update(result)
+        return statuses
+
+    def __enter__(self) -> BugzillaFetcher:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def _connection(self) -> HTTPConnection:
+        """Get the HTTP connection of the calling thread.
+
+        Args:
+            None
+
+        Returns:
+            Connection.
+        """
+        conn: HTTPConnection | None = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.url.scheme == "https":
+                conn = HTTPSConnection(self.url.netloc, timeout=self.timeout)
+            else:
+                conn = HTTPConnection(self.url.netloc, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _fetch(self, bugs: list[int]) -> dict[int, str]:
+        """Fetch the status of a batch of bugs.
+
+        Args:
+            bugs: Bugs to look up.
+
+        Returns:
+            Status of each accessible bug.
+        """
+        query = urlencode(
+            {"id": ",".join(str(x) for x in bugs), "include_fields": "id,status"}
+        )
+        headers = {"Accept": "application/json"}
+        if self.api_key:
+            headers["X-BUGZILLA-API-KEY"] = self.api_key
+        conn = self._connection()
+        for attempt in range(2):
+            try:
+                conn.request(
+                    "GET",
+                    f"{self.url.path.rstrip('/')}/rest/bug?{query}",
+                    headers=headers,
+                )
+                response = conn.getresponse()
+                body = response.read()
+                break
+            except (HTTPException, OSError) as exc:
+                # the server may have closed an idle connection, retry once
+                conn.close()
+                if attempt:
+                    raise OSError(f"Bugzilla request failed: {exc!r}") from None
+        if response.status != 200:
+            raise OSError(f"Bugzilla request failed: HTTP {response.status}")
+        try:
+            return {int(x["id"]): str(x["status"]) for x in loads(body)["bugs"]}
+        except (JSONDecodeError, KeyError, TypeError, ValueError):
+            raise OSError("Bugzilla request failed: invalid response") from None
+
+    def close(self) -> None:
+        """Stop worker threads and close all connections.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+def parse_args(argv: list[str] | None = None) -> Namespace:
+    """Handle argument parsing.
+
+    Args:
+        argv: Arguments from the user.
+
+    Returns:
+        Parsed and sanitized arguments.
+    """
+    parser = ArgumentParser(
+        description="Find prefs to review because bugs listed in 'review_on_close'"
+        " have been closed",
+        prog="prefpicker bugs",
+    )
+    parser.add_argument(
+        "input",
+        type=Path,
+        help="Template to check. This can be the path to a template (YAML) file or"
+        " the name of a built-in template.",
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "--snapshot", type=Path, help="JSON file containing bug statuses."
+    )
+    source.add_argument(
+        "--fetch",
+        action="store_true",
+        help=f"Fetch bug statuses from Bugzilla. Set {API_KEY_ENV} to use an API key.",
+    )
+    parser.add_argument(
+        "--url",
+        default=BUGZILLA_URL,
+        help="Bugzilla instance to use (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--batch",
+        default=200,
+        type=int,
+        help="Maximum number of bugs per request (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        default=4,
+        type=int,
+        help="Maximum number of concurrent requests (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--save", type=Path, help="Save fetched bug statuses to a snapshot file."
+    )
+    args = parser.parse_args(argv)
+    args.input = find_template(parser, args.input)
+    if args.snapshot and not args.snapshot.is_file():
+        parser.error(f"Cannot find snapshot file '{args.snapshot}'")
+    if args.save and not args.fetch:
+        parser.error("--save requires --fetch")
+    check_minimum(parser, args, "batch", "concurrency")
+    if urlsplit(args.url).scheme not in ("http", "https"):
+        parser.error("--url must be an http(s) URL")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    """review_on_close bug status check entry point."""
+    args = parse_args(argv)
+    if (pick := load_picker(args.input)) is None:
+        return 1
+    LOG.info("Found %d bug(s) in 'review_on_close' entries", len(pick.review_on_close))
+    try:
+        if args.snapshot:
+            statuses = load_snapshot(args.snapshot)
+        else:
+            with BugzillaFetcher(
+                args.url,
+                api_key=getenv(API_KEY_ENV),
+                batch=args.batch,
+                concurrency=args.concurrency,
+            ) as fetcher:
+                statuses = fetcher(pick.review_on_close)
+            if args.save:
+                save_snapshot(args.save, statuses)
+    except (OSError, SourceDataError) as exc:
+        LOG.error("Failed to get bug statuses: %s", exc)
+        return 1
+    unknown = sorted(set(pick.review_on_close) - set(statuses))
+    if unknown:
+        LOG.warning("Status unknown: %s", ", ".join(str(x) for x in unknown))
+    for bug, status, prefs in closed_bugs(pick, statuses):
+        LOG.info("Bug %d is %s, review: %s", bug, status, ", ".join(prefs))
+    return 0
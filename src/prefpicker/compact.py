@@ -0,0 +1,208 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""Compact integer-encoded assignments"""
+
+from __future__ import annotations
+
+from array import array
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from hashlib import blake2b
+from json import dumps
+from typing import TYPE_CHECKING
+
+from .prefpicker import SourceDataError
+
+if TYPE_CHECKING:
+    from .prefpicker import PrefPicker, PrefValue
+    from .prefsjs import Assignment
+
+__author__ = "Tyson Smith"
+__credits__ = ["Tyson Smith"]
+
+DIGEST_SIZE = 8
+# a pref can have at most 256 options per variant (one byte per index)
+MAX_OPTIONS = 256
+
+
+class CompactAssignment:
+    """Values assigned to prefs stored as option indexes (one byte per pref)
+    against the sorted pref list of a template. The template is identified by
+    its digest.
+    """
+
+    __slots__ = ("digest", "indexes", "variant")
+
+    def __init__(self, digest: bytes, variant: int, indexes: array[int]) -> None:
+        self.digest = digest
+        self.indexes = indexes
+        # index of variant in the sorted variant list
+        self.variant = variant
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CompactAssignment):
+            return NotImplemented
+        return self.to_bytes() == other.to_bytes()
+
+    def __hash__(self) -> int:
+        return hash(self.to_bytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> CompactAssignment:
+        """Create a CompactAssignment from raw bytes.
+
+        Args:
+            data: Data created by CompactAssignment.to_bytes().
+
+        Returns:
+            CompactAssignment object.
+        """
+        if len(data) <= DIGEST_SIZE:
+            raise SourceDataError("invalid compact assignment")
+        indexes = array("B")
+        indexes.frombytes(data[DIGEST_SIZE + 1 :])
+        return cls(data[:DIGEST_SIZE], data[DIGEST_SIZE], indexes)
+
+    @classmethod
+    def from_token(cls, token: str) -> CompactAssignment:
+        """Create a CompactAssignment from a token.
+
+        Args:
+            token: Token created by CompactAssignment.token().
+
+        Returns:
+            CompactAssignment object.
+        """
+        try:
+            data = urlsafe_b64decode(token.encode("ascii"))
+        except (BinasciiError, UnicodeEncodeError, ValueError):
+            raise SourceDataError("invalid token") from None
+        return cls.from_bytes(data)
+
+    def to_bytes(self) -> bytes:
+        """Raw representation (digest, variant index then option indexes).
+
+        Args:
+            None
+
+        Returns:
+            Raw data.
+        """
+        return self.digest + bytes((self.variant,)) + self.indexes.tobytes()
+
+    def token(self) -> str:
+        """URL and filesystem safe text representation.
+
+        Args:
+            None
+
+        Returns:
+            Base64 encoded data.
+        """
+        return urlsafe_b64encode(self.to_bytes()).decode("ascii")
+
+
+class AssignmentEncoder:
+    """Convert assignments to and from CompactAssignments for a template."""
+
+    __slots__ = ("digest", "picker", "prefs", "variants")
+
+    def __init__(self, picker: PrefPicker) -> None:
+        self.picker = picker
+        self.prefs = tuple(sorted(picker.prefs))
+        self.variants = tuple(sorted(picker.variants))
+        if len(self.variants) > 256:
+            raise SourceDataError("too many variants to encode")
+        for pref in self.prefs:
+            for options in picker.prefs[pref].values():
+                if len(options) > MAX_OPTIONS:
+                    raise SourceDataError(f"too many options to encode ({pref})")
+        data = [(x, dict(picker.prefs[x].items())) for x in self.prefs]
+        self.digest = blake2b(
+            dumps([self.variants, data], sort_keys=True).encode(),
+            digest_size=DIGEST_SIZE,
+        ).digest()
+
+    def decode(self, compact: CompactAssignment) -> tuple[dict[str, PrefValue], str]:
+        """Convert a CompactAssignment to pref values.
+
+        Args:
+            compact: Assignment to decode.
+
+        Returns:
+            Value of each pref and the variant.
+        """
+        if compact.digest != self.digest:
+            raise SourceDataError("assignment was not created from this template")
+        if compact.variant >= len(self.variants) or len(compact.indexes) != len(
+            self.prefs
+        ):
+            raise SourceDataError("invalid compact assignment")
+        variant = self.variants[compact.variant]
+        options = self.picker.options
+        values: dict[str, PrefValue] = {}
+        for pref, index in zip(self.prefs, compact.indexes):
+            pref_options = options(pref, variant)
+            if index >= len(pref_options):
+                raise SourceDataError(f"invalid option index ({pref})")
+            values[pref] = pref_options[index]
+        return values, variant
+
+    def encode(
+        self, values: dict[str, PrefValue], variant: str = "default"
+    ) -> CompactAssignment:
+        """Convert pref values to a CompactAssignment.
+
+        Args:
+            values: Value of each pref in the template. Missing prefs are treated
+                as skipped (None).
+            variant: Variant used to pick the values.
+
+        Returns:
+            Encoded assignment.
+        """
+        try:
+            variant_index = self.variants.index(variant)
+        except ValueError:
+            raise SourceDataError(f"Variant {variant!r} does not exist") from None
+        options = self.picker.options
+        indexes = array("B")
+        for pref in self.prefs:
+            value = values.get(pref)
+            for index, option in enumerate(options(pref, variant)):
+                # compare type so True and 1 are not treated as the same value
+                if type(option) is type(value) and option == value:
+                    indexes.append(index)
+                    break
+            else:
+                raise SourceDataError(f"{value!r} is not an option ({pref})")
+        return CompactAssignment(self.digest, variant_index, indexes)
+
+    def from_prefsjs(self, assignment: Assignment) -> CompactAssignment:
+        """Encode values read from a prefs.js file. Prefs that are not in the
+           template are ignored. Template prefs overridden using --json cannot be
+           encoded, SourceDataError is raised.
+
+        Args:
+            assignment: Values assigned in a prefs.js file.
+
+        Returns:
+            Encoded assignment.
+        """
+        for pref in sorted(assignment.json_prefs):
+            if pref in self.picker.prefs:
+                raise SourceDataError(f"{pref!r} is overridden by --json")
+        return self.encode(assignment.prefs, assignment.variant or "default")
+
+    def render(self, compact: CompactAssignment) -> str:
+        """Create the content of a prefs.js file from a CompactAssignment.
+
+        Args:
+            compact: Assignment to render.
+
+        Returns:
+            prefs.js file content.
+        """
+        values, variant = self.decode(compact)
+        return self.picker.render(values, variant)
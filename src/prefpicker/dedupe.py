@@ -0,0 +1,188 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""Deduplicated prefs.js generation"""
+
+from __future__ import annotations
+
+from array import array
+from collections import OrderedDict
+from hashlib import blake2b
+from itertools import product
+from math import prod
+from random import randrange
+from typing import TYPE_CHECKING, Any
+
+from .compact import AssignmentEncoder, CompactAssignment
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from .prefpicker import PrefPicker, PrefValue
+
+__author__ = "Tyson Smith"
+__credits__ = ["Tyson Smith"]
+
+
+class SeenSet:
+    """Bounded set of recently used assignments. Each variant has its own least
+    recently used (LRU) set of fixed size digests.
+    """
+
+    __slots__ = ("_seen", "size")
+
+    def __init__(self, size: int = 100_000) -> None:
+        assert size > 0
+        self._seen: dict[int, OrderedDict[int, None]] = {}
+        # maximum number of entries per variant
+        self.size = size
+
+    def __contains__(self, compact: object) -> bool:
+        if not isinstance(compact, CompactAssignment):
+            return False
+        seen = self._seen.get(compact.variant)
+        return seen is not None and self._digest(compact) in seen
+
+    def __len__(self) -> int:
+        return sum(len(x) for x in self._seen.values())
+
+    @staticmethod
+    def _digest(compact: CompactAssignment) -> int:
+        return int.from_bytes(
+            blake2b(compact.to_bytes(), digest_size=8).digest(), "little"
+        )
+
+    def add(self, compact: CompactAssignment) -> bool:
+        """Add an assignment to the set and mark it as most recently used.
+
+        Args:
+            compact: Assignment to add.
+
+        Returns:
+            True if the assignment was not in the set otherwise False.
+        """
+        seen = self._seen.setdefault(compact.variant, OrderedDict())
+        digest = self._digest(compact)
+        if digest in seen:
+            seen.move_to_end(digest)
+            return False
+        seen[digest] = None
+        if len(seen) > self.size:
+            seen.popitem(last=False)
+        return True
+
+
+class UniquePicker:
+    """Pick values avoiding recently used configurations. When a duplicate is
+    picked values are picked again. If no unused configuration is found after a
+    few attempts and the variant has a small number of combinations, the
+    combinations are enumerated to find one that has not been used.
+    """
+
+    __slots__ = ("attempts", "avoided", "encoder", "exhausted", "picker", "seen")
+
+    def __init__(
+        self, picker: PrefPicker, seen: SeenSet | None = None, attempts: int = 10
+    ) -> None:
+        assert attempts > 0
+        self.attempts = attempts
+        # number of duplicates that were avoided
+        self.avoided = 0
+        self.encoder = AssignmentEncoder(picker)
+        # number of times a duplicate could not be avoided
+        self.exhausted = 0
+        self.picker = picker
+        self.seen = seen or SeenSet()
+
+    def _enumerate(self, variant: str) -> CompactAssignment | None:
+        """Find an assignment that is not in the seen set by enumerating the
+        combinations of the variant.
+
+        Args:
+            variant: Variant to use.
+
+        Returns:
+            Unused assignment if one is found otherwise None.
+        """
+        counts = [len(self.picker.options(x, variant)) for x in self.encoder.prefs]
+        if prod(counts) > self.seen.size:
+            # the seen set cannot contain all combinations
+            return None
+        variant_index = self.encoder.variants.index(variant)
+        for indexes in product(*(range(x) for x in counts)):
+            compact = CompactAssignment(
+                self.encoder.digest, variant_index, array("B", indexes)
+            )
+            if compact not in self.seen and (
+                not self.picker.constraints
+                or self.picker.satisfies_constraints(self.encoder.decode(compact)[0])
+            ):
+                return compact
+        return None
+
+    def _random(self, variant: str) -> CompactAssignment:
+        """Randomly pick an option for each pref (see PrefPicker.select()).
+
+        Args:
+            variant: Variant to use.
+
+        Returns:
+            Assignment.
+        """
+        if self.picker.constraints:
+            return self.encoder.encode(self.picker.select(variant), variant)
+        options = self.picker.options
+        indexes = array(
+            "B", (randrange(len(options(x, variant))) for x in self.encoder.prefs)
+        )
+        return CompactAssignment(
+            self.encoder.digest, self.encoder.variants.index(variant), indexes
+        )
+
+    def create_prefsjs(
+        self,
+        dest: Path,
+        variant: str = "default",
+        additional_prefs: dict[str, Any] | None = None,
+    ) -> None:
+        """Write a `prefs.js` file using a configuration that has not been used
+           recently. See PrefPicker.create_prefsjs().
+
+        Args:
+            dest: Path of file to create.
+            variant: Used to pick the values to output.
+            additional_prefs: Additional preferences to include in the output.
+
+        Returns:
+            None
+        """
+        data = self.picker.render(self.select(variant), variant, additional_prefs)
+        dest.write_text(data)
+
+    def select(self, variant: str = "default") -> dict[str, PrefValue]:
+        """Pick a value for each pref avoiding recently used configurations.
+        See PrefPicker.select().
+
+        Args:
+            variant: Variant to use.
+
+        Returns:
+            Value of each pref in the template.
+        """
+        duplicates = 0
+        for _ in range(self.attempts):
+            compact = self._random(variant)
+            if self.seen.add(compact):
+                break
+            duplicates += 1
+        else:
+            found = self._enumerate(variant)
+            if found is None:
+                # a duplicate is used, nothing was avoided
+                duplicates = 0
+                self.exhausted += 1
+            else:
+                compact = found
+                self.seen.add(compact)
+        self.avoided += duplicates
+        return self.encoder.decode(compact)[0]
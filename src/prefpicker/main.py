@@ -5,20 +5,91 @@
 
 from __future__ import annotations
 
+import sys
 from argparse import ArgumentParser, Namespace
+from contextlib import ExitStack
+from cProfile import Profile
+from importlib import import_module
 from json import JSONDecodeError
 from json import load as json_load
 from logging import DEBUG, INFO, basicConfig, getLogger
 from os import getenv
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from .prefpicker import PrefPicker, SourceDataError, __version__
+from .profiling import TRACE_ENV, TRACER
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
 
 __author__ = "Tyson Smith"
 __credits__ = ["Tyson Smith"]
 
 LOG = getLogger(__name__)
 
+# additional commands, selected using the first argument. Command modules are
+# only imported when used.
+COMMANDS = {
+    "bugs": "prefpicker.bugs",
+    "reduce": "prefpicker.reduce",
+    "stats": "prefpicker.stats",
+    "validate": "prefpicker.validate",
+}
+
+
+def check_minimum(parser: ArgumentParser, args: Namespace, *options: str) -> None:
+    """Report an error if the value of an option is less than one. Options that
+    are not set (None) are ignored. Shared by all commands.
+
+    Args:
+        parser: Parser to report the error with.
+        args: Parsed arguments.
+        options: Names of options (argument attribute names) to check.
+
+    Returns:
+        None
+    """
+    for option in options:
+        value = getattr(args, option)
+        if value is not None and value < 1:
+            parser.error(f"--{option.replace('_', '-')} must be >= 1")
+
+
+def find_template(parser: ArgumentParser, path: Path) -> Path:
+    """Find a template file. Names of built-in templates are accepted. Shared by
+    all commands.
+
+    Args:
+        parser: Parser to report the error with if the template cannot be found.
+        path: Path of template file or name of a built-in template.
+
+    Returns:
+        Template file.
+    """
+    builtin_template = PrefPicker.lookup_template(path.name)
+    if builtin_template:
+        return builtin_template
+    if not path.is_file():
+        parser.error(f"Cannot find input file '{path}'")
+    return path
+
+
+def load_picker(path: Path) -> PrefPicker | None:
+    """Load a template, errors are logged. Shared by all commands.
+
+    Args:
+        path: Template file.
+
+    Returns:
+        PrefPicker object or None if the template is invalid.
+    """
+    try:
+        return PrefPicker.load_template(path)
+    except SourceDataError as exc:
+        LOG.error("Failed to load '%s': %s", path, exc)
+    return None
+
 
 def parse_args(argv: list[str] | None = None) -> Namespace:
     """Handle argument parsing.
@@ -31,6 +102,8 @@ def parse_args(argv: list[str] | None = None) -> Namespace:
     """
     parser = ArgumentParser(
         description="Manage & generate prefs.js files",
+        epilog=f"Additional commands: {', '.join(sorted(COMMANDS))}"
+        " (run 'prefpicker <command> --help' for usage)",
         prog="prefpicker",
     )
     parser.add_argument(
@@ -40,11 +113,36 @@ def parse_args(argv: list[str] | None = None) -> Namespace:
         " (YAML) file or the name of a built-in template. Built-in templates:"
         f" {', '.join(x.name for x in PrefPicker.templates())}",
     )
-    parser.add_argument("output", type=Path, help="Path of prefs.js file to create.")
+    parser.add_argument(
+        "output",
+        type=Path,
+        help="Path of prefs.js file to create. When multiple variants are used this"
+        " is the directory to create 'prefs-<variant>.js' files in.",
+    )
     parser.add_argument(
         "--check", action="store_true", help="Display output of sanity checks."
     )
-    parser.add_argument("--variant", default="default", help="Specify variant to use.")
+    parser.add_argument(
+        "--campaign",
+        type=int,
+        help="Used with --check. Estimate coverage and duplicates when generating"
+        " the given number of files.",
+    )
+    parser.add_argument(
+        "--cprofile", type=Path, help="Save cProfile statistics to the given file."
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        help="Append phase timings and counters as JSON lines to the given file."
+        f" The {TRACE_ENV} environment variable can also be used to set the file.",
+    )
+    parser.add_argument(
+        "--variant",
+        default="default",
+        help="Specify variant to use. Use a comma separated list or 'all' to create"
+        " a file for each variant.",
+    )
     parser.add_argument(
         "--json",
         "-j",
@@ -60,19 +158,30 @@ def parse_args(argv: list[str] | None = None) -> Namespace:
     )
     args = parser.parse_args(argv)
     # handle using built-in templates
-    builtin_template = PrefPicker.lookup_template(args.input.name)
-    if builtin_template:
-        args.input = builtin_template
-    elif not args.input.is_file():
-        parser.error(f"Cannot find input file '{args.input}'")
+    args.input = find_template(parser, args.input)
+    args.variants = None
+    if args.variant == "all" or "," in args.variant:
+        args.variants = [x for x in args.variant.split(",") if x]
+        if not args.variants:
+            parser.error("--variant list is empty")
     # sanity check output
-    if args.output.is_dir():
+    if args.variants:
+        if args.output.exists() and not args.output.is_dir():
+            parser.error(f"Output '{args.output}' is not a directory.")
+    elif args.output.is_dir():
         parser.error(f"Output '{args.output}' is a directory.")
     if not args.output.parent.is_dir():
         parser.error(f"Output '{args.output.parent}' directory does not exist.")
     # sanity check JSON file if provided
     if args.json and not args.json.is_file():
         parser.error(f"Cannot find JSON file '{args.json}'")
+    if args.campaign is not None and not args.check:
+        parser.error("--campaign requires --check")
+    check_minimum(parser, args, "campaign")
+    if args.cprofile and not args.cprofile.parent.is_dir():
+        parser.error(f"Output '{args.cprofile.parent}' directory does not exist.")
+    if args.profile and not args.profile.parent.is_dir():
+        parser.error(f"Output '{args.profile.parent}' directory does not exist.")
     return args
 
 
@@ -90,35 +199,96 @@ def main(argv: list[str] | None = None) -> int:
         log_level = INFO
     basicConfig(format=log_fmt, level=log_level)
 
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in COMMANDS:
+        command: Callable[[list[str] | None], int] = import_module(
+            COMMANDS[argv[0]]
+        ).main
+        return command(argv[1:])
+
     args = parse_args(argv)
 
+    with ExitStack() as stack:
+        # trace output is kept separate from log output (stderr)
+        trace_file = args.profile or getenv(TRACE_ENV)
+        if trace_file:
+            TRACER.enable(
+                stack.enter_context(Path(trace_file).open("a", encoding="utf-8"))
+            )
+        stack.callback(TRACER.disable)
+        if args.cprofile:
+            profiler = Profile()
+            stack.callback(profiler.dump_stats, str(args.cprofile))
+            stack.callback(profiler.disable)
+            profiler.enable()
+        return generate(args)
+
+
+def generate(args: Namespace) -> int:
+    """Generate a prefs.js file.
+
+    Args:
+        args: Parsed arguments.
+
+    Returns:
+        Exit code.
+    """
     LOG.info("Loading %r...", args.input.name)
-    try:
-        pick = PrefPicker.load_template(args.input)
-    except SourceDataError as exc:
-        LOG.error("Failed to load '%s': %s", args.input, exc)
+    pick = load_picker(args.input)
+    if pick is None:
         return 1
     LOG.info("Loaded %d prefs and %d variants", len(pick.prefs), len(pick.variants))
     if args.check:
-        for combos in pick.check_combinations():
-            LOG.info(
-                "Check: %r variant has %r possible combination(s)", combos[0], combos[1]
-            )
-        for overwrites in pick.check_overwrites():
-            LOG.info(
-                "Check: %r variant %r redefines value %r (may be intentional)",
-                overwrites[0],
-                overwrites[1],
-                overwrites[2],
-            )
-        for dupes in pick.check_duplicates():
-            LOG.info(
-                "Check: %r variant %r contains duplicate values", dupes[0], dupes[1]
-            )
-    if args.variant not in pick.variants:
-        LOG.error("Error: Variant %r does not exist", args.variant)
-        return 1
-    LOG.info("Generating %r using variant %r...", args.output.name, args.variant)
+        with TRACER.phase("check_combinations"):
+            for combos in pick.check_combinations():
+                LOG.info(
+                    "Check: %r variant has %r possible combination(s)",
+                    combos[0],
+                    combos[1],
+                )
+        with TRACER.phase("check_overwrites"):
+            for overwrites in pick.check_overwrites():
+                LOG.info(
+                    "Check: %r variant %r redefines value %r (may be intentional)",
+                    overwrites[0],
+                    overwrites[1],
+                    overwrites[2],
+                )
+        with TRACER.phase("check_duplicates"):
+            for dupes in pick.check_duplicates():
+                LOG.info(
+                    "Check: %r variant %r contains duplicate values",
+                    dupes[0],
+                    dupes[1],
+                )
+        if args.campaign:
+            with TRACER.phase("check_coverage"):
+                for coverage in pick.check_coverage(args.campaign):
+                    LOG.info(
+                        "Check: %r variant has %0.1f bits of entropy, %d files are"
+                        " expected to use %0.1f%% of value pairs and contain %0.1f"
+                        " duplicate(s)",
+                        coverage[0],
+                        coverage[1],
+                        args.campaign,
+                        coverage[2] * 100,
+                        coverage[3],
+                    )
+    if args.variants == ["all"]:
+        args.variants = sorted(pick.variants)
+    for variant in args.variants or (args.variant,):
+        if variant not in pick.variants:
+            LOG.error("Error: Variant %r does not exist", variant)
+            return 1
+    if args.variants:
+        LOG.info(
+            "Generating files in %r using %d variants...",
+            args.output.name,
+            len(args.variants),
+        )
+    else:
+        LOG.info("Generating %r using variant %r...", args.output.name, args.variant)
 
     # Load additional preferences from JSON file if provided
     additional_prefs = {}
@@ -134,6 +304,10 @@ def main(argv: list[str] | None = None) -> int:
             return 1
         LOG.info("Overriding %d prefs from JSON input", len(additional_prefs))
 
-    pick.create_prefsjs(args.output, args.variant, additional_prefs)
+    if args.variants:
+        args.output.mkdir(exist_ok=True)
+        pick.create_prefsjs_variants(args.output, args.variants, additional_prefs)
+    else:
+        pick.create_prefsjs(args.output, args.variant, additional_prefs)
     LOG.info("Done.")
     return 0
@@ -8,16 +8,21 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from importlib.metadata import PackageNotFoundError, version
 from json import dumps
+from math import expm1, log1p, log2
 from pathlib import Path
-from random import choice
+from random import choice, shuffle
+from sys import intern
+from types import MappingProxyType
 from typing import TYPE_CHECKING, Any
 
 from yaml import safe_load
 from yaml.parser import ParserError
 from yaml.scanner import ScannerError
 
+from .profiling import TRACER
+
 if TYPE_CHECKING:
-    from collections.abc import Generator
+    from collections.abc import Collection, Generator, Iterable, Mapping, Sequence
 
 __author__ = "Tyson Smith"
 __credits__ = ["Tyson Smith"]
@@ -34,15 +39,221 @@ class SourceDataError(Exception):
 
 PrefValue = bool | int | str | None
 PrefVariant = dict[str, list[PrefValue]]
+# type is included so values such as True and 1 are not treated as equal
+ValueKey = tuple[type, PrefValue]
+# trigger value, target pref, target values and 'requires' (or 'conflicts')
+Rule = tuple[ValueKey, str, frozenset[ValueKey], bool]
+
+
+def value_key(value: PrefValue) -> ValueKey:
+    """Create a key that can be used to compare values of different types.
+
+    Args:
+        value: Pref value.
+
+    Returns:
+        Key.
+    """
+    return (type(value), value)
+
+
+def _is_option(keys: dict[str, Any], value: Any) -> bool:
+    """Check if value is defined by any variant of a pref.
+
+    Args:
+        keys: Raw pref entry.
+        value: Value to look up.
+
+    Returns:
+        True if value is an option otherwise False.
+    """
+    key = value_key(value)
+    return any(
+        key == value_key(option)
+        for options in keys["variants"].values()
+        for option in options
+    )
+
+
+class Pref:
+    """Values of a pref. Options are stored as tuples and variant names are
+    interned. Most prefs only define 'default' so overrides are only allocated
+    when other variants are defined.
+    """
+
+    __slots__ = ("default", "overrides")
+
+    def __init__(
+        self,
+        default: tuple[PrefValue, ...],
+        overrides: dict[str, tuple[PrefValue, ...]] | None = None,
+    ) -> None:
+        self.default = default
+        self.overrides = overrides or None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Pref):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __getitem__(self, key: str) -> Mapping[str, tuple[PrefValue, ...]]:
+        # read-only view matching the raw template entry ({"variants": ...})
+        if key != "variants":
+            raise KeyError(key)
+        return MappingProxyType(dict(self.items()))
+
+    @classmethod
+    def from_variants(
+        cls,
+        variants: dict[str, list[PrefValue]],
+        cache: dict[tuple[ValueKey, ...], tuple[PrefValue, ...]] | None = None,
+    ) -> Pref:
+        """Create a Pref from the 'variants' entry of a template.
+
+        Args:
+            variants: Values of each variant.
+            cache: Used to share identical option tuples between prefs.
+
+        Returns:
+            Pref object.
+        """
+        if cache is None:
+            cache = {}
+        default = None
+        overrides = {}
+        for variant, values in variants.items():
+            options = tuple(values)
+            # key includes type so (1,) and (True,) are not shared
+            options = cache.setdefault(tuple(value_key(x) for x in options), options)
+            if variant == "default":
+                default = options
+            else:
+                overrides[intern(variant)] = options
+        if default is None:
+            raise SourceDataError("missing 'default' variant")
+        return cls(default, overrides)
+
+    def items(self) -> Generator[tuple[str, tuple[PrefValue, ...]]]:
+        """Values of each variant defined by the pref ('default' first).
+
+        Args:
+            None
+
+        Yields:
+            Variant and values.
+        """
+        yield ("default", self.default)
+        if self.overrides:
+            yield from self.overrides.items()
+
+    def options(self, variant: str = "default") -> tuple[PrefValue, ...]:
+        """Values available when using the specified variant.
+
+        Args:
+            variant: Variant to use.
+
+        Returns:
+            Values defined by the variant or 'default' if the pref does not
+            have a matching variant entry.
+        """
+        if self.overrides and variant in self.overrides:
+            return self.overrides[variant]
+        return self.default
+
+    def values(self) -> Generator[tuple[PrefValue, ...]]:
+        """Values of each variant defined by the pref ('default' first).
+
+        Args:
+            None
+
+        Yields:
+            Values.
+        """
+        yield self.default
+        if self.overrides:
+            yield from self.overrides.values()
 
 
 class PrefPicker:  # pylint: disable=missing-docstring
-    __slots__ = ("prefs", "variants")
+    __slots__ = ("_prefs", "_watchers", "constraints", "review_on_close", "variants")
 
     def __init__(self) -> None:
-        self.prefs: dict[str, dict[str, PrefVariant]] = {}
+        self._prefs: Mapping[str, Pref] = {}
+        # map of pref -> (trigger pref, rule) for each rule the pref is part of,
+        # used to find the rules to check when the values of a pref change
+        self._watchers: dict[str, list[tuple[str, Rule]]] = {}
+        # map of pref -> constraint rules triggered by the value of the pref
+        self.constraints: dict[str, list[Rule]] = {}
+        # map of bug number -> prefs to review when the bug is closed
+        self.review_on_close: dict[int, list[str]] = {}
         self.variants: set[str] = {"default"}
 
+    @property
+    def prefs(self) -> Mapping[str, Pref]:
+        """Prefs in the template.
+
+        Args:
+            None
+
+        Returns:
+            Map of pref name to Pref.
+        """
+        return self._prefs
+
+    @prefs.setter
+    def prefs(self, prefs: Mapping[str, Pref | dict[str, Any]]) -> None:
+        """Set prefs. Entries can be Pref objects or raw template entries
+        (containing a 'variants' dict).
+
+        Args:
+            prefs: Map of pref name to Pref or raw template entry.
+
+        Returns:
+            None
+        """
+        cache: dict[tuple[ValueKey, ...], tuple[PrefValue, ...]] = {}
+        self._prefs = {
+            name: (
+                entry
+                if isinstance(entry, Pref)
+                else Pref.from_variants(entry["variants"], cache)
+            )
+            for name, entry in prefs.items()
+        }
+
+    def add_constraint(
+        self,
+        pref: str,
+        value: PrefValue,
+        requires: dict[str, list[PrefValue]] | None = None,
+        conflicts: dict[str, list[PrefValue]] | None = None,
+    ) -> None:
+        """Add a constraint that is enforced when 'pref' is set to 'value'.
+
+        Args:
+            pref: Pref that triggers the constraint.
+            value: Value that triggers the constraint.
+            requires: Prefs that must be set to one of the given values.
+            conflicts: Prefs that must not be set to any of the given values.
+
+        Returns:
+            None
+        """
+        rules = self.constraints.setdefault(pref, [])
+        for targets, required in ((requires, True), (conflicts, False)):
+            for target, values in (targets or {}).items():
+                rule = (
+                    value_key(value),
+                    target,
+                    frozenset(value_key(x) for x in values),
+                    required,
+                )
+                rules.append(rule)
+                self._watchers.setdefault(pref, []).append((pref, rule))
+                self._watchers.setdefault(target, []).append((pref, rule))
+
     def check_combinations(self) -> Generator[tuple[str, int]]:
         """Count the number of combinations for each variation. Only return
            variants that have more than one combination.
@@ -54,17 +265,57 @@ class PrefPicker:  # pylint: disable=missing-docstring
             Variant and number of potential combinations.
         """
         combos = dict.fromkeys(self.variants, 1)
-        for variants in (x["variants"] for x in self.prefs.values()):
+        for pref in self.prefs.values():
             for variant in combos:
                 # use 'default' if pref does not have a matching variant entry
-                if variant not in variants:
-                    combos[variant] *= len(variants["default"])
-                else:
-                    combos[variant] *= len(variants[variant])
+                combos[variant] *= len(pref.options(variant))
         for variant, count in sorted(combos.items()):
             if count > 1:
                 yield (variant, count)
 
+    def check_coverage(self, files: int) -> Generator[tuple[str, float, float, float]]:
+        """Estimate how well randomly generated files cover the configurations of
+           each variant. Values are calculated from the number of options of each
+           pref assuming each option is equally likely to be picked and prefs are
+           picked independently (constraints are ignored).
+
+        Args:
+            files: Number of files to generate.
+
+        Yields:
+            Variant, entropy (bits), expected fraction of value pairs of prefs
+            with multiple options that are used and expected number of duplicate
+            configurations.
+        """
+        assert files > 0
+        for variant in sorted(self.variants):
+            # number of prefs with each option count
+            groups: dict[int, int] = {}
+            for pref in self.prefs.values():
+                count = len(pref.options(variant))
+                if count > 1:
+                    groups[count] = groups.get(count, 0) + 1
+            entropy = sum(log2(k) * n for k, n in groups.items())
+            # value pairs and expected number used for each combination of groups
+            total = 0.0
+            covered = 0.0
+            sizes = sorted(groups)
+            for idx, size_a in enumerate(sizes):
+                for size_b in sizes[idx:]:
+                    if size_a == size_b:
+                        pairs = groups[size_a] * (groups[size_a] - 1) // 2
+                    else:
+                        pairs = groups[size_a] * groups[size_b]
+                    values = size_a * size_b
+                    total += pairs * values
+                    covered -= pairs * values * expm1(files * log1p(-1 / values))
+            coverage = covered / total if total else 1.0
+            # expected number of distinct configurations is C(1 - (1 - 1/C)^N)
+            # limit to avoid overflow, duplicates are not expected in that case
+            combos = 2.0 ** min(entropy, 1000)
+            distinct = -combos * expm1(files * log1p(-1 / combos)) if groups else 1
+            yield (variant, entropy, coverage, max(0.0, files - distinct))
+
     def check_duplicates(self) -> Generator[tuple[str, str]]:
         """Look for variants with values that appear more than once per variant.
 
@@ -74,11 +325,10 @@ class PrefPicker:  # pylint: disable=missing-docstring
         Yields:
             Pref name and the variant.
         """
-        for pref, keys in sorted(self.prefs.items()):
-            variants = keys["variants"]
-            for variant in variants:
-                if len(variants[variant]) != len(set(variants[variant])):
-                    yield (pref, variant)
+        for name, pref in sorted(self.prefs.items()):
+            for variant, values in pref.items():
+                if len(values) != len(set(values)):
+                    yield (name, variant)
 
     def check_overwrites(self) -> Generator[tuple[str, str, PrefValue]]:
         """Look for variants that overwrite the default with the same value.
@@ -89,14 +339,11 @@ class PrefPicker:  # pylint: disable=missing-docstring
         Yields:
             Pref, variant and value.
         """
-        for pref, keys in sorted(self.prefs.items()):
-            variants = keys["variants"]
-            for variant in variants:
-                if variant == "default":
-                    continue
-                for value in variants[variant]:
-                    if value in variants["default"]:
-                        yield (pref, variant, value)
+        for name, pref in sorted(self.prefs.items()):
+            for variant, values in (pref.overrides or {}).items():
+                for value in values:
+                    if value in pref.default:
+                        yield (name, variant, value)
 
     def create_prefsjs(
         self,
@@ -115,67 +362,78 @@ class PrefPicker:  # pylint: disable=missing-docstring
         Returns:
             None
         """
-        with dest.open("w") as prefs_fp:
-            prefs_fp.write(f"// Generated with PrefPicker ({__version__}) @ ")
-            prefs_fp.write(datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S %Z"))
-            prefs_fp.write(f"\n// Variant {variant!r}\n")
-
-            all_prefs = set(self.prefs)
-            if additional_prefs:
-                all_prefs |= set(additional_prefs)
-            for pref in sorted(all_prefs):
-                # choose values
-                if additional_prefs and pref in additional_prefs:
-                    value = additional_prefs[pref]
-                    if pref not in self.prefs:
-                        # pref is only from JSON, not in template
-                        if value is None:
-                            continue
-                        json_only = True
-                    else:
-                        json_only = False
-                    options = [value]
-                    default_variant = False
-                else:
-                    json_only = False
-                    keys = self.prefs[pref]
-                    variants = keys["variants"]
-                    if variant not in variants or variant == "default":
-                        options = variants["default"]
-                        default_variant = True
-                    else:
-                        options = variants[variant]
-                        default_variant = False
-                    value = choice(options)
-                if value is None:
-                    if len(options) > 1:
-                        prefs_fp.write(
-                            f"// '{pref}' skipped, options {dumps(options)}\n"
-                        )
-                    # skipping pref
-                    continue
-                if len(options) > 1:
-                    prefs_fp.write(f"// '{pref}' options {dumps(options)}\n")
-                # sanitize value for writing
-                if isinstance(value, bool):
-                    sanitized = "true" if value else "false"
-                elif isinstance(value, int):
-                    sanitized = str(value)
-                elif isinstance(value, str):
-                    sanitized = repr(value)
-                else:
-                    prefs_fp.write(f"// Failed to sanitized {value!r} ({pref})\n")
-                    raise SourceDataError(
-                        f"Unsupported datatype {type(value).__name__!r}"
-                    )
-                # write to prefs.js file
-                if json_only:
-                    prefs_fp.write(f"// {pref!r} defined by --json (not in template)\n")
-                elif additional_prefs and pref in additional_prefs:
-                    prefs_fp.write(f"// {pref!r} defined by --json override\n")
-                elif not default_variant:
-                    prefs_fp.write(f"// {pref!r} defined by variant {variant!r}\n")
-                prefs_fp.write(f'user_pref("{pref}", {sanitized});\n')
+        with TRACER.phase("select"):
+            values = self.select(variant)
+        with TRACER.phase("render"):
+            data = self.render(values, variant, additional_prefs)
+        with TRACER.phase("write"):
+            dest.write_text(data)
+        if TRACER.enabled:
+            TRACER.count("bytes_written", len(data.encode()))
+
+    def create_prefsjs_variants(
+        self,
+        dest: Path,
+        variants: Iterable[str],
+        additional_prefs: dict[str, Any] | None = None,
+    ) -> dict[str, Path]:
+        """Write a `prefs-<variant>.js` file for each variant. Values of prefs that
+           are the same for all variants are picked and rendered once and used
+           in each file. See create_prefsjs().
+
+        Args:
+            dest: Existing directory to create files in.
+            variants: Variants to use.
+            additional_prefs: Additional preferences to include in the output.
+
+        Returns:
+            Created file of each variant.
+        """
+        with TRACER.phase("select"):
+            shared = self.select_shared()
+        cache: dict[str, str] = {}
+        created: dict[str, Path] = {}
+        for variant in variants:
+            with TRACER.phase("select"):
+                values = self.select(variant, shared)
+            with TRACER.phase("render"):
+                data = self._render(
+                    values, variant, additional_prefs, shared=shared, cache=cache
+                )
+            created[variant] = dest / f"prefs-{variant}.js"
+            with TRACER.phase("write"):
+                created[variant].write_text(data)
+            if TRACER.enabled:
+                TRACER.count("bytes_written", len(data.encode()))
+        return created
+
+    @classmethod
+    def from_data(cls, raw_prefs: Any) -> PrefPicker:
+        """Create a PrefPicker from template data that has already been parsed.
+        The data is verified first.
+
+        Args:
+            raw_prefs: Template data.
+
+        Returns:
+            PrefPicker object.
+        """
+        with TRACER.phase("verify_data"):
+            cls.verify_data(raw_prefs)
+        picker = cls()
+        picker.variants = set(raw_prefs["variant"] + ["default"])
+        picker.prefs = raw_prefs["pref"]
+        for pref, keys in sorted(raw_prefs["pref"].items()):
+            for bug in keys.get("review_on_close", ()):
+                picker.review_on_close.setdefault(bug, []).append(pref)
+        for constraint in raw_prefs.get("constraint", []):
+            picker.add_constraint(
+                constraint["pref"],
+                constraint["value"],
+                requires=constraint.get("requires"),
+                conflicts=constraint.get("conflicts"),
+            )
+        return picker
 
     @classmethod
     def lookup_template(cls, name: str) -> Path | None:
@@ -202,18 +460,322 @@ class PrefPicker:  # pylint: disable=missing-docstring
         Returns:
             PrefPicker object.
         """
-        try:
-            raw_prefs = safe_load(input_yml.read_bytes())
-        except (ScannerError, ParserError):
-            raise SourceDataError("invalid YAML") from None
-        cls.verify_data(raw_prefs)
-        picker = cls()
-        picker.variants = set(raw_prefs["variant"] + ["default"])
-        # only add relevant parts
-        for pref, parts in raw_prefs["pref"].items():
-            picker.prefs[pref] = {"variants": parts["variants"]}
+        with TRACER.phase("load_template"):
+            try:
+                raw_prefs = safe_load(input_yml.read_bytes())
+            except (ScannerError, ParserError):
+                raise SourceDataError("invalid YAML") from None
+            picker = cls.from_data(raw_prefs)
+        TRACER.count("prefs", len(picker.prefs))
+        TRACER.count("variants", len(picker.variants))
         return picker
 
+    def options(self, pref: str, variant: str = "default") -> tuple[PrefValue, ...]:
+        """Available values for a pref when using the specified variant.
+
+        Args:
+            pref: Pref name.
+            variant: Variant to use.
+
+        Returns:
+            Values defined by the variant or by 'default' if the pref does not
+            have a matching variant entry.
+        """
+        return self.prefs[pref].options(variant)
+
+    def render(
+        self,
+        values: dict[str, PrefValue],
+        variant: str = "default",
+        additional_prefs: dict[str, Any] | None = None,
+        reverted: Collection[str] = (),
+    ) -> str:
+        """Create the content of a `prefs.js` file using the given values.
+
+        Args:
+            values: Value of each pref in the template.
+            variant: Variant used to pick the values.
+            additional_prefs: Additional preferences to include in the output.
+            reverted: Prefs with values picked from the 'default' variant
+                instead of 'variant'.
+
+        Returns:
+            prefs.js file content.
+        """
+        return self._render(values, variant, additional_prefs, reverted=reverted)
+
+    def _render(
+        self,
+        values: dict[str, PrefValue],
+        variant: str,
+        additional_prefs: dict[str, Any] | None,
+        *,
+        shared: Collection[str] = (),
+        cache: dict[str, str] | None = None,
+        reverted: Collection[str] = (),
+    ) -> str:
+        """Create the content of a `prefs.js` file using the given values.
+
+        Args:
+            values: Value of each pref in the template.
+            variant: Variant used to pick the values.
+            additional_prefs: Additional preferences to include in the output.
+            shared: Prefs that are rendered the same way for all variants.
+            cache: Rendered entries of shared prefs (updated).
+            reverted: Prefs with values picked from the 'default' variant.
+
+        Returns:
+            prefs.js file content.
+        """
+        out = [
+            f"// Generated with PrefPicker ({__version__}) @ ",
+            datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S %Z"),
+            f"\n// Variant {variant!r}\n",
+        ]
+        all_prefs = set(self.prefs)
+        if additional_prefs:
+            all_prefs |= set(additional_prefs)
+        for pref in sorted(all_prefs):
+            if cache is not None and pref in shared:
+                if pref not in cache:
+                    cache[pref] = self._render_pref(
+                        pref, values, variant, additional_prefs
+                    )
+                out.append(cache[pref])
+            elif pref in reverted:
+                out.append(self._render_pref(pref, values, "default", additional_prefs))
+            else:
+                out.append(self._render_pref(pref, values, variant, additional_prefs))
+        return "".join(out)
+
+    def _render_pref(
+        self,
+        pref: str,
+        values: dict[str, PrefValue],
+        variant: str,
+        additional_prefs: dict[str, Any] | None,
+    ) -> str:
+        """Render the entry of a single pref.
+
+        Args:
+            pref: Pref to render.
+            values: Value of each pref in the template.
+            variant: Variant used to pick the values.
+            additional_prefs: Additional preferences to include in the output.
+
+        Returns:
+            Comments and user_pref() call (empty if the pref is skipped).
+        """
+        out: list[str] = []
+        # choose values
+        if additional_prefs and pref in additional_prefs:
+            value = additional_prefs[pref]
+            if pref not in self.prefs:
+                # pref is only from JSON, not in template
+                if value is None:
+                    return ""
+                json_only = True
+            else:
+                json_only = False
+            options: Sequence[PrefValue] = [value]
+            default_variant = False
+        else:
+            json_only = False
+            pref_obj = self.prefs[pref]
+            options = pref_obj.options(variant)
+            default_variant = (
+                not pref_obj.overrides or variant not in pref_obj.overrides
+            )
+            value = values[pref]
+        if value is None:
+            if len(options) > 1:
+                out.append(f"// '{pref}' skipped, options {dumps(options)}\n")
+            # skipping pref
+            return "".join(out)
+        if len(options) > 1:
+            out.append(f"// '{pref}' options {dumps(options)}\n")
+        # sanitize value for writing
+        if isinstance(value, bool):
+            sanitized = "true" if value else "false"
+        elif isinstance(value, int):
+            sanitized = str(value)
+        elif isinstance(value, str):
+            sanitized = repr(value)
+        else:
+            raise SourceDataError(
+                f"Unsupported datatype {type(value).__name__!r} ({pref})"
+            )
+        # write to prefs.js file
+        if json_only:
+            out.append(f"// {pref!r} defined by --json (not in template)\n")
+        elif additional_prefs and pref in additional_prefs:
+            out.append(f"// {pref!r} defined by --json override\n")
+        elif not default_variant:
+            out.append(f"// {pref!r} defined by variant {variant!r}\n")
+        out.append(f'user_pref("{pref}", {sanitized});\n')
+        return "".join(out)
+
+    def _propagate(
+        self,
+        domains: dict[str, frozenset[ValueKey]],
+        pending: list[str],
+        trail: list[tuple[str, frozenset[ValueKey]]],
+    ) -> bool:
+        """Remove values from domains that cannot satisfy the constraints until
+        no more values can be removed. Only the rules of prefs with domains that
+        have changed are checked.
+
+        Args:
+            domains: Remaining values of each constrained pref (modified in place).
+            pending: Prefs with domains that have changed (consumed).
+            trail: Previous domains of modified prefs (appended to).
+
+        Returns:
+            False if a domain is empty (constraints cannot be satisfied)
+            otherwise True.
+        """
+        queued = set(pending)
+        while pending:
+            changed = pending.pop()
+            queued.discard(changed)
+            for pref, (trigger, target, values, required) in self._watchers[changed]:
+                domain = domains[pref]
+                if trigger not in domain:
+                    continue
+                target_domain = domains[target]
+                allowed = target_domain & values if required else target_domain - values
+                if not allowed:
+                    # trigger value cannot be used
+                    if len(domain) == 1:
+                        return False
+                    trail.append((pref, domain))
+                    domains[pref] = domain - {trigger}
+                    update = pref
+                elif len(domain) == 1 and len(allowed) != len(target_domain):
+                    # trigger value must be used, limit target values
+                    trail.append((target, target_domain))
+                    domains[target] = allowed
+                    update = target
+                else:
+                    continue
+                if update not in queued:
+                    queued.add(update)
+                    pending.append(update)
+        return True
+
+    def _search(
+        self,
+        domains: dict[str, frozenset[ValueKey]],
+        trail: list[tuple[str, frozenset[ValueKey]]],
+    ) -> bool:
+        """Pick a value for each constrained pref, backtracking when a pick leaves
+        no valid values for another pref. The pref with the fewest remaining
+        values is picked first and values are tried in random order.
+
+        Args:
+            domains: Remaining values of each constrained pref (modified in place).
+            trail: Previous domains of modified prefs (appended to).
+
+        Returns:
+            True if a value was picked for each pref otherwise False.
+        """
+        unfixed = [(len(x), pref) for pref, x in domains.items() if len(x) > 1]
+        if not unfixed:
+            return True
+        pref = min(unfixed)[1]
+        candidates = list(domains[pref])
+        shuffle(candidates)
+        for candidate in candidates:
+            mark = len(trail)
+            trail.append((pref, domains[pref]))
+            domains[pref] = frozenset((candidate,))
+            if self._propagate(domains, [pref], trail) and self._search(domains, trail):
+                return True
+            # undo changes made by the failed candidate
+            while len(trail) > mark:
+                undo, domain = trail.pop()
+                domains[undo] = domain
+        return False
+
+    def satisfies_constraints(self, values: dict[str, PrefValue]) -> bool:
+        """Check if values satisfy all constraints.
+
+        Args:
+            values: Value of each pref in the template.
+
+        Returns:
+            True if all constraints are satisfied otherwise False.
+        """
+        for pref, rules in self.constraints.items():
+            key = value_key(values.get(pref))
+            for trigger, target, targets, required in rules:
+                if key == trigger and (
+                    (value_key(values.get(target)) in targets) != required
+                ):
+                    return False
+        return True
+
+    def select(
+        self, variant: str = "default", shared: dict[str, PrefValue] | None = None
+    ) -> dict[str, PrefValue]:
+        """Randomly pick a value for each pref using the specified variant.
+        Constraints are enforced by propagating the effect of each picked value
+        to the remaining values of the other constrained prefs and backtracking
+        when a picked value leaves no valid values for another pref.
+
+        Args:
+            variant: Variant to use.
+            shared: Values already picked for prefs that are the same for all
+                variants (see select_shared()).
+
+        Returns:
+            Value of each pref in the template.
+        """
+        if shared:
+            values = {
+                pref: shared[pref] if pref in shared else choice(obj.options(variant))
+                for pref, obj in self.prefs.items()
+            }
+        else:
+            values = {
+                pref: choice(obj.options(variant)) for pref, obj in self.prefs.items()
+            }
+        if not self._watchers:
+            return values
+        domains = {
+            pref: frozenset(value_key(x) for x in self.options(pref, variant))
+            for pref in self._watchers
+        }
+        trail: list[tuple[str, frozenset[ValueKey]]] = []
+        if not self._propagate(domains, sorted(domains), trail) or not self._search(
+            domains, trail
+        ):
+            raise SourceDataError(f"constraints cannot be satisfied ({variant})")
+        for pref, domain in domains.items():
+            # the value is stored in the key
+            values[pref] = next(iter(domain))[1]
+        return values
+
+    def select_shared(self) -> dict[str, PrefValue]:
+        """Randomly pick a value for each pref that is the same for all variants.
+        These are prefs that are not overridden by a variant and are not part of
+        a constraint.
+
+        Args:
+            None
+
+        Returns:
+            Value of each shared pref.
+        """
+        constrained = set(self.constraints)
+        for rules in self.constraints.values():
+            constrained.update(rule[1] for rule in rules)
+        return {
+            pref: choice(pref_obj.default)
+            for pref, pref_obj in self.prefs.items()
+            if not pref_obj.overrides and pref not in constrained
+        }
+
     @staticmethod
     def templates() -> Generator[Path]:
         """Available YAML template files.
@@ -269,6 +831,16 @@ class PrefPicker:  # pylint: disable=missing-docstring
                 raise SourceDataError(f"{pref!r} is missing 'variants' dict")
             if "default" not in variants:
                 raise SourceDataError(f"{pref!r} is missing 'default' variant")
+            # verify review_on_close list (optional)
+            bugs = keys.get("review_on_close")
+            if bugs is not None and (
+                not isinstance(bugs, list)
+                or not bugs
+                or any(isinstance(x, bool) or not isinstance(x, int) for x in bugs)
+            ):
+                raise SourceDataError(
+                    f"'review_on_close' in {pref!r} must be a list of bug numbers"
+                )
             # verify variants
             for variant in variants:
                 if variant not in valid_variants:
@@ -291,3 +863,53 @@ class PrefPicker:  # pylint: disable=missing-docstring
             raise SourceDataError(
                 f"Unused variants {' '.join(valid_variants - used_variants)!r}"
             )
+        # check constraint list (optional)
+        constraints = raw_data.get("constraint", [])
+        if not isinstance(constraints, list):
+            raise SourceDataError("constraint is not a list")
+        for constraint in constraints:
+            if not isinstance(constraint, dict):
+                raise SourceDataError("constraint entry must contain a dict")
+            unknown = set(constraint) - {"conflicts", "pref", "requires", "value"}
+            if unknown:
+                raise SourceDataError(
+                    f"unknown constraint key(s) {' '.join(sorted(unknown))!r}"
+                )
+            pref = constraint.get("pref")
+            if not isinstance(pref, str) or pref not in raw_data["pref"]:
+                raise SourceDataError(f"constraint pref {pref!r} is not defined")
+            if "value" not in constraint:
+                raise SourceDataError(f"constraint for {pref!r} is missing 'value'")
+            if not _is_option(raw_data["pref"][pref], constraint["value"]):
+                raise SourceDataError(
+                    f"constraint value {constraint['value']!r} is not a value of"
+                    f" {pref!r}"
+                )
+            if "conflicts" not in constraint and "requires" not in constraint:
+                raise SourceDataError(
+                    f"constraint for {pref!r} is missing 'requires' or 'conflicts'"
+                )
+            for kind in ("conflicts", "requires"):
+                if kind not in constraint:
+                    continue
+                targets = constraint[kind]
+                if not isinstance(targets, dict) or not targets:
+                    raise SourceDataError(
+                        f"{kind!r} in constraint for {pref!r} must be a dict"
+                    )
+                for target, values in targets.items():
+                    if target == pref or target not in raw_data["pref"]:
+                        raise SourceDataError(
+                            f"{kind!r} in constraint for {pref!r} contains invalid"
+                            f" pref {target!r}"
+                        )
+                    if not isinstance(values, list) or not values:
+                        raise SourceDataError(
+                            f"{target!r} in constraint for {pref!r} must be a list"
+                        )
+                    for value in values:
+                        if not _is_option(raw_data["pref"][target], value):
+                            raise SourceDataError(
+                                f"constraint value {value!r} is not a value of"
+                                f" {target!r}"
+                            )
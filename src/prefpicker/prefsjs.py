@@ -0,0 +1,196 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""prefs.js reader"""
+
+from __future__ import annotations
+
+from ast import literal_eval
+from concurrent.futures import ProcessPoolExecutor
+from json import JSONDecodeError, loads
+from typing import TYPE_CHECKING
+
+from .prefpicker import SourceDataError
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable
+    from pathlib import Path
+
+    from .prefpicker import PrefValue
+
+__author__ = "Tyson Smith"
+__credits__ = ["Tyson Smith"]
+
+HEADER = "// Generated with PrefPicker ("
+VARIANT = "// Variant "
+USER_PREF = 'user_pref("'
+
+
+class Assignment:
+    """Values assigned to prefs in a prefs.js file created by PrefPicker."""
+
+    __slots__ = ("json_prefs", "options", "prefs", "variant", "version")
+
+    def __init__(self) -> None:
+        # prefs defined by --json (overrides and prefs not in the template)
+        self.json_prefs: set[str] = set()
+        # available options for prefs that had more than one option
+        self.options: dict[str, list[PrefValue]] = {}
+        # value assigned to each pref, skipped prefs have a value of None
+        self.prefs: dict[str, PrefValue] = {}
+        self.variant: str | None = None
+        self.version: str | None = None
+
+
+def _parse_comment(line: str, assignment: Assignment) -> None:
+    """Parse a comment line and update assignment.
+
+    Args:
+        line: Comment line (including the leading '//').
+        assignment: Assignment to update.
+
+    Returns:
+        None
+    """
+    if line.startswith(HEADER):
+        assignment.version = line[len(HEADER) :].partition(")")[0]
+    elif line.startswith(VARIANT):
+        assignment.variant = literal_eval(line[len(VARIANT) :])
+    elif line.startswith("// '") or line.startswith('// "'):
+        # comments about a specific pref start with the quoted pref name
+        quote = line[3]
+        end = line.find(quote, 4)
+        if end < 0:
+            return
+        pref = line[4:end]
+        desc = line[end + 2 :]
+        if desc.startswith("skipped, options "):
+            assignment.options[pref] = loads(desc[17:])
+            assignment.prefs[pref] = None
+        elif desc.startswith("options "):
+            assignment.options[pref] = loads(desc[8:])
+        elif desc.startswith("defined by --json"):
+            assignment.json_prefs.add(pref)
+
+
+def _parse_value(raw: str) -> PrefValue:
+    """Convert a value from a user_pref() line.
+
+    Args:
+        raw: Sanitized value as written by PrefPicker.
+
+    Returns:
+        Value.
+    """
+    if raw == "true":
+        return True
+    if raw == "false":
+        return False
+    if raw[:1] in ("'", '"'):
+        value = literal_eval(raw)
+        if isinstance(value, str):
+            return value
+        raise ValueError(raw)
+    return int(raw)
+
+
+def parse_prefsjs(lines: Iterable[str]) -> Assignment:
+    """Parse the content of a prefs.js file created by PrefPicker.
+
+    Args:
+        lines: Lines of the prefs.js file.
+
+    Returns:
+        Values assigned in prefs.js file.
+    """
+    assignment = Assignment()
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            if line.startswith("//"):
+                _parse_comment(line, assignment)
+            elif line.startswith(USER_PREF) and line.endswith(");"):
+                pref, sep, raw = line[len(USER_PREF) : -2].partition('", ')
+                if not sep:
+                    raise ValueError(line)
+                assignment.prefs[pref] = _parse_value(raw)
+            else:
+                raise ValueError(line)
+        except (JSONDecodeError, SyntaxError, ValueError):
+            raise SourceDataError(f"invalid prefs.js entry (line {line_no})") from None
+    return assignment
+
+
+def read_prefsjs(path: Path) -> Assignment:
+    """Read a prefs.js file created by PrefPicker.
+
+    Args:
+        path: File to read.
+
+    Returns:
+        Values assigned in prefs.js file.
+    """
+    try:
+        with path.open() as in_fp:
+            return parse_prefsjs(in_fp)
+    except SourceDataError as exc:
+        raise SourceDataError(f"'{path}': {exc}") from None
+    except UnicodeDecodeError:
+        raise SourceDataError(f"'{path}': invalid prefs.js encoding") from None
+
+
+def _read_prefsjs_safe(path: Path) -> Assignment | SourceDataError:
+    """Read a prefs.js file, invalid files do not raise.
+
+    Args:
+        path: File to read.
+
+    Returns:
+        Values assigned in prefs.js file or the error if the file is invalid.
+    """
+    try:
+        return read_prefsjs(path)
+    except SourceDataError as exc:
+        return exc
+
+
+def read_prefsjs_files(
+    paths: Iterable[Path], workers: int | None = None
+) -> Generator[tuple[Path, Assignment | SourceDataError]]:
+    """Read prefs.js files in parallel. Results are yielded in the same order as
+       the given paths. Invalid files do not interrupt reading, the error is
+       yielded in place of the values so callers can skip or report them.
+
+    Args:
+        paths: Files to read.
+        workers: Maximum number of worker processes (default is CPU count).
+
+    Yields:
+        File and the values assigned in it (or the SourceDataError it caused).
+    """
+    files = tuple(paths)
+    if workers == 1 or len(files) < 2:
+        for path in files:
+            yield (path, _read_prefsjs_safe(path))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # use large chunks, parsing a single file is cheap
+        chunk = max(1, len(files) // ((workers or 8) * 4))
+        yield from zip(files, executor.map(_read_prefsjs_safe, files, chunksize=chunk))
+
+
+def scan_prefsjs(path: Path, pattern: str = "*.js") -> Generator[Path]:
+    """Find prefs.js files in a directory (recursively).
+
+    Args:
+        path: Directory to scan.
+        pattern: Glob pattern used to match files.
+
+    Yields:
+        Files that match pattern.
+    """
+    for entry in sorted(path.rglob(pattern)):
+        if entry.is_file():
+            yield entry
@@ -0,0 +1,116 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""Timing and counter instrumentation"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager, nullcontext
+from json import dumps
+from time import perf_counter
+from typing import TYPE_CHECKING, TextIO
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+    from contextlib import AbstractContextManager
+
+__author__ = "Tyson Smith"
+__credits__ = ["Tyson Smith"]
+
+# environment variable containing the path of a file to append trace data to
+TRACE_ENV = "PREFPICKER_TRACE"
+
+_DISABLED: AbstractContextManager[None] = nullcontext()
+
+
+class Tracer:
+    """Record phase timings and counters as JSON lines. When disabled, phase()
+    returns a shared no-op context manager and count() returns immediately.
+    """
+
+    __slots__ = ("_out", "counters")
+
+    def __init__(self) -> None:
+        self._out: TextIO | None = None
+        self.counters: dict[str, int] = {}
+
+    @contextmanager
+    def _timed(self, name: str) -> Generator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self._write({"phase": name, "duration": perf_counter() - start})
+
+    def _write(self, entry: dict[str, object]) -> None:
+        if self._out is not None:
+            self._out.write(f"{dumps(entry)}\n")
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Increment a counter.
+
+        Args:
+            name: Name of counter.
+            value: Amount to add.
+
+        Returns:
+            None
+        """
+        if self._out is not None:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def disable(self) -> None:
+        """Write counters and stop recording.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self._out is not None:
+            self._write({"counters": self.counters})
+            self._out.flush()
+            self._out = None
+        self.counters = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Check if data is being recorded.
+
+        Args:
+            None
+
+        Returns:
+            True if enabled otherwise False.
+        """
+        return self._out is not None
+
+    def enable(self, out: TextIO) -> None:
+        """Start recording.
+
+        Args:
+            out: Stream to write JSON lines to.
+
+        Returns:
+            None
+        """
+        self._out = out
+        self.counters = {}
+
+    def phase(self, name: str) -> AbstractContextManager[None]:
+        """Measure the duration of a phase.
+
+        Args:
+            name: Name of phase.
+
+        Returns:
+            Context manager.
+        """
+        if self._out is None:
+            return _DISABLED
+        return self._timed(name)
+
+
+# shared tracer used by PrefPicker
+TRACER = Tracer()
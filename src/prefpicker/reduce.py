@@ -0,0 +1,350 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""prefpicker prefs.js reducer"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from logging import getLogger
+from os import cpu_count
+from pathlib import Path
+from shlex import split as shlex_split
+from subprocess import DEVNULL, TimeoutExpired, run
+from tempfile import TemporaryDirectory
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from .main import check_minimum, find_template, load_picker
+from .prefpicker import PrefPicker, SourceDataError
+from .prefsjs import read_prefsjs
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from .prefpicker import PrefValue
+    from .prefsjs import Assignment
+
+__author__ = "Tyson Smith"
+__credits__ = ["Tyson Smith"]
+
+LOG = getLogger(__name__)
+
+# placeholder in the test command that is replaced with the prefs.js path
+PREFS_PLACEHOLDER = "{prefs}"
+
+
+class PrefReducer:
+    """Reduce the prefs in a failing prefs.js using delta debugging (ddmin).
+    A pref is reverted to the value of the 'default' variant when the 'default'
+    variant contains a single value, otherwise it is removed. Candidates are
+    tested in parallel and results are cached so each subset is only tested once.
+    """
+
+    __slots__ = (
+        "_cache",
+        "_command",
+        "_counter",
+        "_executor",
+        "_lock",
+        "_timeout",
+        "_values",
+        "_working",
+        "cache_hits",
+        "changes",
+        "jobs",
+        "picker",
+        "reverted",
+        "tests",
+        "variant",
+    )
+
+    def __init__(
+        self,
+        picker: PrefPicker,
+        assignment: Assignment,
+        command: Sequence[str],
+        working: Path,
+        *,
+        jobs: int = 1,
+        timeout: float | None = None,
+    ) -> None:
+        self._cache: dict[frozenset[str], bool] = {}
+        self._command = tuple(command)
+        self._counter = count()
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = Lock()
+        self._timeout = timeout
+        # values from the original prefs.js
+        self._values = dict(assignment.prefs)
+        self._working = working
+        self.cache_hits = 0
+        self.jobs = jobs
+        self.picker = picker
+        self.tests = 0
+        self.variant = assignment.variant or "default"
+        if self.variant not in picker.variants:
+            raise SourceDataError(f"Variant {self.variant!r} does not exist")
+        # values used when a pref is reverted
+        self.reverted: dict[str, PrefValue] = {}
+        for pref in picker.prefs:
+            options = picker.options(pref, "default")
+            self.reverted[pref] = options[0] if len(options) == 1 else None
+            # prefs not found in the prefs.js were skipped
+            self._values.setdefault(pref, None)
+        # prefs that differ from the reverted value
+        self.changes: list[str] = []
+        for pref, value in sorted(self._values.items()):
+            if pref not in self.reverted:
+                # pref is not in template (defined by --json)
+                if value is not None:
+                    self.changes.append(pref)
+                continue
+            reverted = self.reverted[pref]
+            if type(value) is not type(reverted) or value != reverted:
+                self.changes.append(pref)
+
+    def render(self, keep: frozenset[str]) -> str:
+        """Create prefs.js content keeping only the specified changes.
+
+        Args:
+            keep: Changes to keep.
+
+        Returns:
+            prefs.js file content.
+        """
+        values: dict[str, PrefValue] = {}
+        extra: dict[str, PrefValue] = {}
+        reverted: set[str] = set()
+        for pref, value in self.reverted.items():
+            if pref in keep:
+                values[pref] = self._values[pref]
+            else:
+                values[pref] = value
+                reverted.add(pref)
+        for pref in keep:
+            if pref not in self.reverted:
+                extra[pref] = self._values[pref]
+        return self.picker.render(values, self.variant, extra, reverted=reverted)
+
+    def _test(self, keep: frozenset[str]) -> bool:
+        """Run the test command using a prefs.js keeping the specified changes.
+
+        Args:
+            keep: Changes to keep.
+
+        Returns:
+            True if the test failed (the candidate is interesting) otherwise False.
+        """
+        with self._lock:
+            if keep in self._cache:
+                self.cache_hits += 1
+                return self._cache[keep]
+            self.tests += 1
+            prefs_js = self._working / f"prefs-{next(self._counter)}.js"
+        prefs_js.write_text(self.render(keep))
+        if any(PREFS_PLACEHOLDER in x for x in self._command):
+            cmd = [x.replace(PREFS_PLACEHOLDER, str(prefs_js)) for x in self._command]
+        else:
+            cmd = [*self._command, str(prefs_js)]
+        try:
+            result = run(
+                cmd,
+                check=False,
+                stderr=DEVNULL,
+                stdout=DEVNULL,
+                timeout=self._timeout,
+            ).returncode
+        except TimeoutExpired:
+            LOG.debug("test timed out")
+            result = 0
+        finally:
+            prefs_js.unlink()
+        with self._lock:
+            self._cache[keep] = result != 0
+        return result != 0
+
+    def _first_failure(self, candidates: list[frozenset[str]]) -> int | None:
+        """Test candidates in parallel.
+
+        Args:
+            candidates: Sets of changes to test.
+
+        Returns:
+            Index of the first candidate that failed or None.
+        """
+        if self._executor is not None and len(candidates) > 1:
+            results = list(self._executor.map(self._test, candidates))
+        else:
+            results = []
+            for candidate in candidates:
+                results.append(self._test(candidate))
+                if results[-1]:
+                    break
+        for idx, failed in enumerate(results):
+            if failed:
+                return idx
+        return None
+
+    def run(self) -> list[str] | None:
+        """Reduce changes.
+
+        Args:
+            None
+
+        Returns:
+            Minimal list of changes required to cause the test to fail or None if
+            the original configuration does not cause a failure.
+        """
+        if self.jobs > 1:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                self._executor = executor
+                try:
+                    return self._ddmin()
+                finally:
+                    self._executor = None
+        return self._ddmin()
+
+    def _ddmin(self) -> list[str] | None:
+        """Reduce changes using ddmin. See run().
+
+        Args:
+            None
+
+        Returns:
+            Minimal list of changes or None.
+        """
+        current = list(self.changes)
+        if not self._test(frozenset(current)):
+            return None
+        if not current or self._test(frozenset()):
+            return []
+        granularity = 2
+        while len(current) >= 2:
+            size, extra = divmod(len(current), granularity)
+            chunks = []
+            start = 0
+            for idx in range(granularity):
+                end = start + size + (1 if idx < extra else 0)
+                chunks.append(current[start:end])
+                start = end
+            # test subsets
+            found = self._first_failure([frozenset(x) for x in chunks])
+            if found is not None:
+                current = chunks[found]
+                granularity = 2
+                LOG.debug("reduced to subset (%d)", len(current))
+                continue
+            # test complements
+            complements = []
+            for chunk in chunks:
+                removed = set(chunk)
+                complements.append([x for x in current if x not in removed])
+            if granularity > 2:
+                found = self._first_failure([frozenset(x) for x in complements])
+                if found is not None:
+                    current = complements[found]
+                    granularity = max(granularity - 1, 2)
+                    LOG.debug("reduced to complement (%d)", len(current))
+                    continue
+            if granularity >= len(current):
+                break
+            granularity = min(len(current), granularity * 2)
+        return current
+
+
+def parse_args(argv: list[str] | None = None) -> Namespace:
+    """Handle argument parsing.
+
+    Args:
+        argv: Arguments from the user.
+
+    Returns:
+        Parsed and sanitized arguments.
+    """
+    parser = ArgumentParser(
+        description="Reduce the prefs in a prefs.js file that causes a failure",
+        prog="prefpicker reduce",
+    )
+    parser.add_argument(
+        "input",
+        type=Path,
+        help="Template used to generate the prefs.js file. This can be the path to"
+        " a template (YAML) file or the name of a built-in template.",
+    )
+    parser.add_argument("prefs", type=Path, help="prefs.js file to reduce.")
+    parser.add_argument(
+        "output", type=Path, help="Path of reduced prefs.js file to create."
+    )
+    parser.add_argument(
+        "--cmd",
+        required=True,
+        help="Test command. A non-zero exit code indicates a failure. The path of"
+        f" the prefs.js to test replaces {PREFS_PLACEHOLDER!r} or is appended.",
+    )
+    parser.add_argument(
+        "--jobs",
+        default=cpu_count() or 1,
+        type=int,
+        help="Maximum number of tests to run in parallel (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--timeout", type=float, help="Maximum runtime of a test in seconds."
+    )
+    args = parser.parse_args(argv)
+    args.input = find_template(parser, args.input)
+    if not args.prefs.is_file():
+        parser.error(f"Cannot find prefs.js file '{args.prefs}'")
+    if args.output.is_dir():
+        parser.error(f"Output '{args.output}' is a directory.")
+    if not args.output.parent.is_dir():
+        parser.error(f"Output '{args.output.parent}' directory does not exist.")
+    args.cmd = shlex_split(args.cmd)
+    if not args.cmd:
+        parser.error("--cmd must not be empty")
+    check_minimum(parser, args, "jobs")
+    if args.timeout is not None and args.timeout <= 0:
+        parser.error("--timeout must be > 0")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Reduce entry point."""
+    args = parse_args(argv)
+    if (pick := load_picker(args.input)) is None:
+        return 1
+    try:
+        assignment = read_prefsjs(args.prefs)
+    except SourceDataError as exc:
+        LOG.error("Failed to load prefs.js: %s", exc)
+        return 1
+    with TemporaryDirectory(prefix="prefpicker_") as working:
+        try:
+            reducer = PrefReducer(
+                pick,
+                assignment,
+                args.cmd,
+                Path(working),
+                jobs=args.jobs,
+                timeout=args.timeout,
+            )
+        except SourceDataError as exc:
+            LOG.error("Error: %s", exc)
+            return 1
+        LOG.info("Reducing %d changed prefs...", len(reducer.changes))
+        result = reducer.run()
+    if result is None:
+        LOG.error("Error: Test did not fail using '%s'", args.prefs)
+        return 1
+    args.output.write_text(reducer.render(frozenset(result)))
+    LOG.info(
+        "Reduced to %d pref(s) (%d tests, %d cached)",
+        len(result),
+        reducer.tests,
+        reducer.cache_hits,
+    )
+    for pref in result:
+        LOG.info("Required: %r", pref)
+    return 0
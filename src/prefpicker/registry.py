@@ -0,0 +1,178 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""Template registry"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from .prefpicker import PrefPicker
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+__author__ = "Tyson Smith"
+__credits__ = ["Tyson Smith"]
+
+BUILTIN_TEMPLATES = Path(__file__).parent.resolve() / "templates"
+
+
+class _Entry:
+    __slots__ = ("digest", "path", "picker", "stamp")
+
+    def __init__(
+        self, path: Path, stamp: tuple[int, int], digest: bytes, picker: PrefPicker
+    ) -> None:
+        self.digest = digest
+        self.path = path
+        self.picker = picker
+        self.stamp = stamp
+
+
+class TemplateRegistry:
+    """Find templates in multiple search paths and cache loaded PrefPickers.
+    Templates are loaded on first use. Cached entries are revalidated using the
+    modification time and size of the file, if those have changed the content
+    hash is compared before the template is reloaded. The least recently used
+    entry is evicted when the cache is full.
+    """
+
+    __slots__ = (
+        "_cache",
+        "_lock",
+        "evictions",
+        "hits",
+        "misses",
+        "reloads",
+        "search_paths",
+        "size",
+    )
+
+    def __init__(
+        self, search_paths: Iterable[Path] | None = None, size: int = 8
+    ) -> None:
+        assert size > 0
+        self._cache: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = Lock()
+        self.evictions = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        # earlier paths take precedence
+        self.search_paths = (
+            [BUILTIN_TEMPLATES] if search_paths is None else list(search_paths)
+        )
+        self.size = size
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def clear(self) -> None:
+        """Remove all cached templates.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._cache.clear()
+
+    def get(self, name: str) -> PrefPicker:
+        """Get a loaded template. The returned object is shared and must not be
+        modified.
+
+        Args:
+            name: Name of template.
+
+        Returns:
+            PrefPicker object.
+        """
+        path = self.lookup(name)
+        if path is None:
+            raise KeyError(name)
+        stat = path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._cache.get(name)
+            if entry is not None and entry.path == path and entry.stamp == stamp:
+                self._cache.move_to_end(name)
+                self.hits += 1
+                return entry.picker
+        digest = sha256(path.read_bytes()).digest()
+        with self._lock:
+            if entry is not None and entry.path == path and entry.digest == digest:
+                # file was touched but not modified
+                entry.stamp = stamp
+                self._cache.move_to_end(name)
+                self.hits += 1
+                return entry.picker
+        picker = PrefPicker.load_template(path)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+            self._cache[name] = _Entry(path, stamp, digest, picker)
+            self._cache.move_to_end(name)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return picker
+
+    def lookup(self, name: str) -> Path | None:
+        """Find a template in the search paths.
+
+        Args:
+            name: Name of template.
+
+        Returns:
+            Path of the first template that matches 'name' or None.
+        """
+        for search_path in self.search_paths:
+            path = search_path / name
+            if path.is_file():
+                return path
+        return None
+
+    def metrics(self) -> dict[str, int]:
+        """Cache metrics.
+
+        Args:
+            None
+
+        Returns:
+            Number of cached templates, hits, misses, reloads and evictions.
+        """
+        with self._lock:
+            return {
+                "cached": len(self._cache),
+                "evictions": self.evictions,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+            }
+
+    def templates(self) -> dict[str, Path]:
+        """Available YAML template files. When templates in multiple search paths
+        have the same name the first one found is used.
+
+        Args:
+            None
+
+        Returns:
+            Map of template name to path.
+        """
+        found: dict[str, Path] = {}
+        for search_path in self.search_paths:
+            if search_path.is_dir():
+                for template in sorted(search_path.iterdir()):
+                    if template.suffix.lower().endswith(".yml"):
+                        found.setdefault(template.name, template)
+        return found
@@ -0,0 +1,397 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""Read-only templates shared between processes using a memory-mapped file"""
+
+from __future__ import annotations
+
+from collections.abc import ItemsView, Iterator, Mapping
+from json import dumps, loads
+from mmap import ACCESS_READ, mmap
+from os import getpid
+from struct import Struct, pack, pack_into, unpack_from
+from struct import error as StructError
+from typing import TYPE_CHECKING, Any
+from zlib import crc32
+
+from .prefpicker import Pref, PrefPicker, SourceDataError
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from .prefpicker import PrefValue
+
+__author__ = "Tyson Smith"
+__credits__ = ["Tyson Smith"]
+
+# Layout (little-endian):
+#   header: magic, variant count, pref count, index offset, hash slot count,
+#       constraints offset
+#   variants: (u16 length, UTF-8 name) per variant (sorted)
+#   index: u32 offset of each pref record (sorted by pref name)
+#   hash: u32 offset of pref record (0: empty) per slot, slots are found using
+#       the CRC32 of the UTF-8 name (linear probing)
+#   option tables: u16 value count, values (identical tables are stored once)
+#   pref records: u16 length, UTF-8 name, u8 variant count then for each
+#       variant: u8 variant index, u32 offset of option table
+#   values: u8 tag (0: None, 1: False, 2: True, 3: i64, 4: u32 length + UTF-8)
+#   constraints: u32 length, JSON encoded rules
+HEADER = Struct("<4sIIIII")
+MAGIC = b"PPT2"
+VARIANT_ENTRY = Struct("<BI")
+TAG_NONE, TAG_FALSE, TAG_TRUE, TAG_INT, TAG_STR = range(5)
+
+
+def _pack_value(out: bytearray, value: PrefValue) -> None:
+    """Append an encoded value.
+
+    Args:
+        out: Buffer to append to.
+        value: Value to encode.
+
+    Returns:
+        None
+    """
+    if value is None:
+        out.append(TAG_NONE)
+    elif isinstance(value, bool):
+        out.append(TAG_TRUE if value else TAG_FALSE)
+    elif isinstance(value, int):
+        out.append(TAG_INT)
+        out += pack("<q", value)
+    else:
+        encoded = value.encode("utf-8")
+        out.append(TAG_STR)
+        out += pack("<I", len(encoded))
+        out += encoded
+
+
+def publish_template(picker: PrefPicker, dest: Path) -> None:
+    """Write a template in a compact binary form that can be attached to by
+    multiple processes using SharedPrefPicker.
+
+    Args:
+        picker: PrefPicker to publish.
+        dest: File to create. A location backed by memory (such as /dev/shm)
+            avoids disk I/O.
+
+    Returns:
+        None
+    """
+    variants = sorted(picker.variants)
+    if len(variants) > 255:
+        raise SourceDataError("too many variants to publish")
+    variant_index = {x: i for i, x in enumerate(variants)}
+    prefs = sorted(picker.prefs)
+    out = bytearray(HEADER.size)
+    for variant in variants:
+        encoded = variant.encode("utf-8")
+        out += pack("<H", len(encoded))
+        out += encoded
+    index_offset = len(out)
+    out += bytes(4 * len(prefs))
+    # keep the hash table at most half full
+    slots = 1 << (len(prefs) * 2).bit_length()
+    hash_offset = len(out)
+    out += bytes(4 * slots)
+    tables: dict[bytes, int] = {}
+    try:
+        entries = []
+        for pref in prefs:
+            pref_tables = []
+            for variant, values in sorted(picker.prefs[pref].items()):
+                table = bytearray(pack("<H", len(values)))
+                for value in values:
+                    _pack_value(table, value)
+                # the encoding includes the type so (1,) and (True,) differ
+                if bytes(table) not in tables:
+                    tables[bytes(table)] = len(out)
+                    out += table
+                pref_tables.append((variant_index[variant], tables[bytes(table)]))
+            entries.append(pref_tables)
+        for idx, (pref, pref_tables) in enumerate(zip(prefs, entries)):
+            pack_into("<I", out, index_offset + idx * 4, len(out))
+            encoded = pref.encode("utf-8")
+            slot = crc32(encoded) & (slots - 1)
+            while unpack_from("<I", out, hash_offset + slot * 4)[0]:
+                slot = (slot + 1) & (slots - 1)
+            pack_into("<I", out, hash_offset + slot * 4, len(out))
+            out += pack("<H", len(encoded))
+            out += encoded
+            out.append(len(pref_tables))
+            for entry in pref_tables:
+                out += VARIANT_ENTRY.pack(*entry)
+    except (KeyError, OverflowError, StructError, ValueError) as exc:
+        raise SourceDataError(f"cannot publish template: {exc}") from None
+    constraints_offset = len(out)
+    encoded = dumps(
+        [
+            [pref, rule[0][1], rule[1], [x[1] for x in rule[2]], rule[3]]
+            for pref, rules in sorted(picker.constraints.items())
+            for rule in rules
+        ]
+    ).encode("utf-8")
+    out += pack("<I", len(encoded))
+    out += encoded
+    HEADER.pack_into(
+        out,
+        0,
+        MAGIC,
+        len(variants),
+        len(prefs),
+        index_offset,
+        slots,
+        constraints_offset,
+    )
+    # write then rename so workers never attach to a partial file
+    tmp = dest.with_name(f"{dest.name}.{getpid()}.tmp")
+    tmp.write_bytes(out)
+    tmp.replace(dest)
+
+
+class SharedPrefs(Mapping[str, Pref]):
+    """Read-only mapping of pref name to variants backed by a published template.
+    Entries are found using the hash table and decoded on access, they are not
+    kept. Only option tables are kept once decoded, these are shared by all
+    entries and bounded by the number of distinct tables in the template.
+    """
+
+    __slots__ = ("_buf", "_count", "_hash", "_index", "_mask", "_tables", "_variants")
+
+    def __init__(self, buf: mmap, variants: tuple[str, ...]) -> None:
+        _, _, self._count, self._index, slots, _ = HEADER.unpack_from(buf, 0)
+        if slots < 1 or slots & (slots - 1):
+            raise SourceDataError("invalid shared template")
+        self._buf = buf
+        self._hash = self._index + 4 * self._count
+        self._mask = slots - 1
+        self._tables: dict[int, tuple[PrefValue, ...]] = {}
+        self._variants = variants
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self._find(name) is not None
+
+    def __getitem__(self, name: str) -> Pref:
+        offset = self._find(name)
+        if offset is None:
+            raise KeyError(name)
+        return self._decode(offset)
+
+    def __iter__(self) -> Iterator[str]:
+        for idx in range(self._count):
+            yield self._name(self._record(idx))
+
+    def __len__(self) -> int:
+        return int(self._count)
+
+    def items(self) -> ItemsView[str, Pref]:
+        return _SharedItems(self)
+
+    def records(self) -> Iterator[tuple[str, Pref]]:
+        """Decode all entries in order. This avoids looking up each entry.
+
+        Args:
+            None
+
+        Yields:
+            Pref name and values.
+        """
+        for idx in range(self._count):
+            offset = self._record(idx)
+            yield (self._name(offset), self._decode(offset))
+
+    def _decode(self, offset: int) -> Pref:
+        """Decode a pref record.
+
+        Args:
+            offset: Offset of pref record.
+
+        Returns:
+            Values of the pref.
+        """
+        buf = self._buf
+        offset += 2 + unpack_from("<H", buf, offset)[0]
+        default: tuple[PrefValue, ...] = ()
+        overrides: dict[str, tuple[PrefValue, ...]] = {}
+        for idx in range(buf[offset]):
+            variant, table = VARIANT_ENTRY.unpack_from(
+                buf, offset + 1 + idx * VARIANT_ENTRY.size
+            )
+            options = self._tables.get(table)
+            if options is None:
+                options = self._tables[table] = self._table(table)
+            if self._variants[variant] == "default":
+                default = options
+            else:
+                overrides[self._variants[variant]] = options
+        return Pref(default, overrides)
+
+    def _find(self, name: str) -> int | None:
+        """Look up the record of a pref using the hash table.
+
+        Args:
+            name: Pref name.
+
+        Returns:
+            Offset of pref record if found otherwise None.
+        """
+        buf = self._buf
+        target = name.encode("utf-8")
+        slot = crc32(target) & self._mask
+        for _ in range(self._mask + 1):
+            offset = int(unpack_from("<I", buf, self._hash + slot * 4)[0])
+            if not offset:
+                break
+            length = unpack_from("<H", buf, offset)[0]
+            if buf[offset + 2 : offset + 2 + length] == target:
+                return offset
+            slot = (slot + 1) & self._mask
+        return None
+
+    def _name(self, offset: int) -> str:
+        length = unpack_from("<H", self._buf, offset)[0]
+        return self._buf[offset + 2 : offset + 2 + length].decode("utf-8")
+
+    def _record(self, idx: int) -> int:
+        return int(unpack_from("<I", self._buf, self._index + idx * 4)[0])
+
+    def _table(self, offset: int) -> tuple[PrefValue, ...]:
+        """Decode an option table.
+
+        Args:
+            offset: Offset of option table.
+
+        Returns:
+            Values.
+        """
+        buf = self._buf
+        values: list[PrefValue] = []
+        count = unpack_from("<H", buf, offset)[0]
+        offset += 2
+        for _ in range(count):
+            tag = buf[offset]
+            offset += 1
+            if tag == TAG_NONE:
+                values.append(None)
+            elif tag == TAG_FALSE:
+                values.append(False)
+            elif tag == TAG_TRUE:
+                values.append(True)
+            elif tag == TAG_INT:
+                values.append(unpack_from("<q", buf, offset)[0])
+                offset += 8
+            else:
+                length = unpack_from("<I", buf, offset)[0]
+                offset += 4
+                values.append(buf[offset : offset + length].decode("utf-8"))
+                offset += length
+        return tuple(values)
+
+
+class _SharedItems(ItemsView[str, Pref]):
+    """Items view of SharedPrefs that decodes entries in order."""
+
+    __slots__ = ("_prefs",)
+
+    def __init__(self, prefs: SharedPrefs) -> None:
+        super().__init__(prefs)
+        self._prefs = prefs
+
+    def __iter__(self) -> Iterator[tuple[str, Pref]]:
+        return self._prefs.records()
+
+
+class SharedPrefPicker(PrefPicker):
+    """Read-only PrefPicker attached to a template published using
+    publish_template(). The template data is not copied into the process.
+    """
+
+    __slots__ = ("_map",)
+
+    def __init__(self, buf: mmap) -> None:
+        super().__init__()
+        self._map = buf
+        magic, variant_count, _, _, _, constraints = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise SourceDataError("invalid shared template")
+        names = []
+        offset = HEADER.size
+        for _ in range(variant_count):
+            length = unpack_from("<H", buf, offset)[0]
+            names.append(buf[offset + 2 : offset + 2 + length].decode("utf-8"))
+            offset += 2 + length
+        self.variants = set(names)
+        # assign directly, prefs is read-only
+        self._prefs = SharedPrefs(buf, tuple(names))
+        length = unpack_from("<I", buf, constraints)[0]
+        for pref, value, target, values, required in loads(
+            buf[constraints + 4 : constraints + 4 + length]
+        ):
+            if required:
+                self.add_constraint(pref, value, requires={target: values})
+            else:
+                self.add_constraint(pref, value, conflicts={target: values})
+
+    @property
+    def prefs(self) -> Mapping[str, Pref]:
+        """Prefs in the published template (read-only).
+
+        Args:
+            None
+
+        Returns:
+            Map of pref name to Pref.
+        """
+        return self._prefs
+
+    @prefs.setter
+    def prefs(self, prefs: Mapping[str, Pref | dict[str, Any]]) -> None:
+        """Not supported, prefs are read-only."""
+        raise AttributeError("prefs of a SharedPrefPicker are read-only")
+
+    @classmethod
+    def from_data(cls, raw_prefs: Any) -> PrefPicker:
+        """Not supported, use attach()."""
+        raise TypeError("use SharedPrefPicker.attach()")
+
+    @classmethod
+    def load_template(cls, input_yml: Path) -> PrefPicker:
+        """Not supported, use attach()."""
+        raise TypeError("use SharedPrefPicker.attach()")
+
+    @classmethod
+    def attach(cls, path: Path) -> SharedPrefPicker:
+        """Attach to a published template.
+
+        Args:
+            path: File created by publish_template().
+
+        Returns:
+            SharedPrefPicker object.
+        """
+        with path.open("rb") as in_fp:
+            try:
+                buf = mmap(in_fp.fileno(), 0, access=ACCESS_READ)
+            except ValueError:
+                # empty file
+                raise SourceDataError("invalid shared template") from None
+        try:
+            return cls(buf)
+        except (IndexError, StructError, UnicodeDecodeError, ValueError):
+            buf.close()
+            raise SourceDataError("invalid shared template") from None
+        except SourceDataError:
+            buf.close()
+            raise
+
+    def close(self) -> None:
+        """Detach from the published template. The object must not be used after
+        calling close().
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._map.close()
@@ -0,0 +1,339 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""prefpicker crash correlation statistics"""
+
+from __future__ import annotations
+
+from argparse import ArgumentParser, Namespace
+from heapq import nsmallest
+from itertools import combinations
+from json import dumps
+from logging import getLogger
+from math import erfc, sqrt
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from .main import check_minimum, find_template, load_picker
+from .prefpicker import PrefPicker, SourceDataError
+from .prefsjs import read_prefsjs_files, scan_prefsjs
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable
+
+    from .prefpicker import PrefValue
+    from .prefsjs import Assignment
+
+__author__ = "Tyson Smith"
+__credits__ = ["Tyson Smith"]
+
+LOG = getLogger(__name__)
+
+# lookup tables used to convert a column of codes to an ASCII '0'/'1' per row,
+# the result is parsed as a base 2 integer (one bit per row)
+_MATCH = tuple(bytes(48 + (i == code) for i in range(256)) for code in range(256))
+# a pref can have at most 255 distinct values (code 0 is 'unknown value')
+MAX_CODE = 255
+
+
+class Enrichment(NamedTuple):
+    """Crash enrichment of a pref value or pair of pref values."""
+
+    features: tuple[tuple[str, PrefValue], ...]
+    total: int
+    crashes: int
+    rate: float
+    others_rate: float
+    odds_ratio: float
+    p_value: float
+
+
+class CrashStats:
+    """Count pref values in labeled configurations. Configurations are stored as
+    an integer-encoded matrix (one byte per pref per configuration) in columnar
+    form. Contingency tables are computed using bitwise operations on masks
+    (one bit per configuration) instead of iterating over configurations.
+    """
+
+    __slots__ = ("_codes", "_columns", "_crashes", "_values", "total")
+
+    def __init__(self, picker: PrefPicker) -> None:
+        # map of pref -> (type, value) -> code, type is included so that
+        # True and 1 are not treated as the same value
+        self._codes: dict[str, dict[tuple[type, PrefValue], int]] = {}
+        # map of pref -> value per code (code 0 is not in the template)
+        self._values: dict[str, list[PrefValue]] = {}
+        for pref, entry in sorted(picker.prefs.items()):
+            codes: dict[tuple[type, PrefValue], int] = {}
+            values: list[PrefValue] = [None]
+            for options in entry.values():
+                for value in options:
+                    key = (type(value), value)
+                    if key not in codes and len(values) <= MAX_CODE:
+                        codes[key] = len(values)
+                        values.append(value)
+            # only prefs with more than one possible value are interesting
+            if len(codes) > 1:
+                self._codes[pref] = codes
+                self._values[pref] = values
+        self._columns: dict[str, bytearray] = {x: bytearray() for x in self._codes}
+        self._crashes = bytearray()
+        self.total = 0
+
+    def add(self, assignment: Assignment, crash: bool) -> None:
+        """Add a labeled configuration.
+
+        Args:
+            assignment: Values assigned in a prefs.js file.
+            crash: Configuration resulted in a crash.
+
+        Returns:
+            None
+        """
+        values = assignment.prefs
+        columns = self._columns
+        for pref, codes in self._codes.items():
+            # prefs that are not in the prefs.js file are skipped (None)
+            value = values.get(pref)
+            columns[pref].append(codes.get((type(value), value), 0))
+        self._crashes.append(int(crash))
+        self.total += 1
+
+    def _masks(self, min_count: int) -> Generator[tuple[str, PrefValue, int]]:
+        """Create a mask for each pref value found in at least min_count
+        configurations. Each configuration is represented by one bit so
+        int.bit_count() can be used to count matches.
+
+        Args:
+            min_count: Minimum number of configurations containing the value.
+
+        Yields:
+            Pref, value and mask.
+        """
+        for pref, column in self._columns.items():
+            present = set(column)
+            if len(present) < 2:
+                # value does not vary
+                continue
+            for code in sorted(present - {0}):
+                # reversed so row N is bit N
+                mask = int(column.translate(_MATCH[code])[::-1], 2)
+                if mask.bit_count() >= min_count:
+                    yield (pref, self._values[pref][code], mask)
+
+    def _enrichment(
+        self,
+        features: tuple[tuple[str, PrefValue], ...],
+        mask: int,
+        crash_mask: int,
+        crash_total: int,
+    ) -> Enrichment:
+        """Calculate enrichment from a 2x2 contingency table.
+
+        Args:
+            features: Pref values described by mask.
+            mask: Configurations containing the features.
+            crash_mask: Configurations that crashed.
+            crash_total: Number of configurations that crashed.
+
+        Returns:
+            Crash enrichment.
+        """
+        count = mask.bit_count()
+        crash_with = (mask & crash_mask).bit_count()
+        crash_without = crash_total - crash_with
+        ok_with = count - crash_with
+        ok_without = self.total - count - crash_without
+        others = self.total - count
+        # Haldane-Anscombe correction avoids division by zero
+        odds_ratio = ((crash_with + 0.5) * (ok_without + 0.5)) / (
+            (ok_with + 0.5) * (crash_without + 0.5)
+        )
+        # chi-squared test (one degree of freedom)
+        margins = count * others * crash_total * (self.total - crash_total)
+        if margins:
+            chi2 = (
+                self.total * (crash_with * ok_without - ok_with * crash_without) ** 2
+            ) / margins
+            p_value = erfc(sqrt(chi2 / 2))
+        else:
+            p_value = 1.0
+        return Enrichment(
+            features,
+            count,
+            crash_with,
+            crash_with / count if count else 0.0,
+            crash_without / others if others else 0.0,
+            odds_ratio,
+            p_value,
+        )
+
+    def enrichment(
+        self, min_count: int = 1, pairs: bool = False
+    ) -> Generator[Enrichment]:
+        """Calculate crash enrichment of pref values.
+
+        Args:
+            min_count: Minimum number of configurations containing the value(s).
+            pairs: Include pairs of values from different prefs.
+
+        Yields:
+            Crash enrichment.
+        """
+        crash_mask = int(self._crashes.translate(_MATCH[1])[::-1] or b"0", 2)
+        crash_total = crash_mask.bit_count()
+        masks = tuple(self._masks(min_count))
+        for pref, value, mask in masks:
+            yield self._enrichment(((pref, value),), mask, crash_mask, crash_total)
+        if pairs:
+            for (pref_a, val_a, mask_a), (pref_b, val_b, mask_b) in combinations(
+                masks, 2
+            ):
+                if pref_a == pref_b:
+                    continue
+                mask = mask_a & mask_b
+                if mask.bit_count() >= min_count:
+                    yield self._enrichment(
+                        ((pref_a, val_a), (pref_b, val_b)),
+                        mask,
+                        crash_mask,
+                        crash_total,
+                    )
+
+
+def _add_files(
+    stats: CrashStats, paths: Iterable[Path], crash: bool, workers: int | None
+) -> int:
+    """Add the configurations in prefs.js files. Invalid files are skipped.
+
+    Args:
+        stats: CrashStats to add configurations to.
+        paths: Files and directories.
+        crash: Configurations resulted in a crash.
+        workers: Maximum number of processes used to read files.
+
+    Returns:
+        Number of invalid files skipped.
+    """
+    skipped = 0
+    for _, result in read_prefsjs_files(_find_files(paths), workers=workers):
+        if isinstance(result, SourceDataError):
+            LOG.warning("Skipping %s", result)
+            skipped += 1
+        else:
+            stats.add(result, crash)
+    return skipped
+
+
+def _find_files(paths: Iterable[Path]) -> Generator[Path]:
+    """Expand directories to the prefs.js files they contain.
+
+    Args:
+        paths: Files and directories.
+
+    Yields:
+        Files.
+    """
+    for path in paths:
+        if path.is_dir():
+            yield from scan_prefsjs(path)
+        else:
+            yield path
+
+
+def parse_args(argv: list[str] | None = None) -> Namespace:
+    """Handle argument parsing.
+
+    Args:
+        argv: Arguments from the user.
+
+    Returns:
+        Parsed and sanitized arguments.
+    """
+    parser = ArgumentParser(
+        description="Correlate pref values with crashes",
+        prog="prefpicker stats",
+    )
+    parser.add_argument(
+        "input",
+        type=Path,
+        help="Template used to generate the prefs.js files. This can be the path to"
+        " a template (YAML) file or the name of a built-in template.",
+    )
+    parser.add_argument(
+        "--crash",
+        default=[],
+        nargs="+",
+        type=Path,
+        help="prefs.js files (or directories) from runs that crashed.",
+    )
+    parser.add_argument(
+        "--no-crash",
+        default=[],
+        nargs="+",
+        type=Path,
+        help="prefs.js files (or directories) from runs that did not crash.",
+    )
+    parser.add_argument(
+        "--limit",
+        default=25,
+        type=int,
+        help="Maximum number of results to display (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--min-count",
+        default=5,
+        type=int,
+        help="Ignore values found in fewer configurations (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--pairs", action="store_true", help="Include pairs of pref values."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Maximum number of processes used to read files (default: CPU count).",
+    )
+    args = parser.parse_args(argv)
+    args.input = find_template(parser, args.input)
+    if not args.crash:
+        parser.error("--crash is required")
+    if not args.no_crash:
+        parser.error("--no-crash is required")
+    for path in args.crash + args.no_crash:
+        if not path.exists():
+            parser.error(f"Cannot find '{path}'")
+    check_minimum(parser, args, "limit", "min_count", "workers")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Crash correlation statistics entry point."""
+    args = parse_args(argv)
+    if (pick := load_picker(args.input)) is None:
+        return 1
+    stats = CrashStats(pick)
+    try:
+        skipped = _add_files(stats, args.crash, True, args.workers)
+        skipped += _add_files(stats, args.no_crash, False, args.workers)
+    except OSError as exc:
+        LOG.error("Failed to read prefs.js: %s", exc)
+        return 1
+    LOG.info("Loaded %d configurations (%d invalid skipped)", stats.total, skipped)
+    results = nsmallest(
+        args.limit,
+        stats.enrichment(min_count=args.min_count, pairs=args.pairs),
+        key=lambda x: (x.p_value, -x.odds_ratio),
+    )
+    for result in results:
+        LOG.info(
+            "%s: %d/%d crashed (%0.1f%% vs %0.1f%%), odds ratio %0.2f, p=%0.3g",
+            " & ".join(f"{pref}={dumps(value)}" for pref, value in result.features),
+            result.crashes,
+            result.total,
+            result.rate * 100,
+            result.others_rate * 100,
+            result.odds_ratio,
+            result.p_value,
+        )
+    return 0
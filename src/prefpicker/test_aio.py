@@ -0,0 +1,66 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+"""aio.py tests"""
+
+from asyncio import gather, run
+
+from pytest import raises
+
+from .aio import AsyncPrefPicker, async_create_prefsjs
+from .prefpicker import PrefPicker, SourceDataError
+
+TEMPLATE = {
+    "variant": ["v1"],
+    "pref": {"test.a": {"variants": {"default": [0], "v1": [1]}}},
+}
+
+
+def test_aio_01(tmp_path):
+    """test AsyncPrefPicker.create_prefsjs()"""
+    ppick = PrefPicker.from_data(TEMPLATE)
+
+    async def _run():
+        async with AsyncPrefPicker(ppick, max_workers=2, max_pending=3) as apick:
+            await gather(
+                *(
+                    apick.create_prefsjs(tmp_path / f"{idx}.js", variant="v1")
+                    for idx in range(10)
+                )
+            )
+            await apick.create_prefsjs(
+                tmp_path / "extra.js", additional_prefs={"test.b": True}
+            )
+
+    run(_run())
+    for idx in range(10):
+        assert 'user_pref("test.a", 1);' in (tmp_path / f"{idx}.js").read_text()
+    prefs_data = (tmp_path / "extra.js").read_text()
+    assert 'user_pref("test.a", 0);' in prefs_data
+    assert 'user_pref("test.b", true);' in prefs_data
+
+
+def test_aio_02(tmp_path):
+    """test AsyncPrefPicker.create_prefsjs() failures"""
+
+    async def _run():
+        apick = AsyncPrefPicker(PrefPicker.from_data(TEMPLATE))
+        try:
+            with raises(SourceDataError, match="Unsupported datatype"):
+                await apick.create_prefsjs(
+                    tmp_path / "prefs.js", additional_prefs={"test.b": 1.1}
+                )
+            with raises(OSError):
+                await apick.create_prefsjs(tmp_path / "missing" / "prefs.js")
+        finally:
+            await apick.aclose()
+
+    run(_run())
+    assert not any(tmp_path.iterdir())
+
+
+def test_aio_03(tmp_path):
+    """test async_create_prefsjs()"""
+    ppick = PrefPicker.from_data(TEMPLATE)
+    run(async_create_prefsjs(ppick, tmp_path / "prefs.js", "v1"))
+    assert 'user_pref("test.a", 1);' in (tmp_path / "prefs.js").read_text()
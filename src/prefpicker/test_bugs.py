@@ -0,0 +1,159 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+"""bugs.py tests"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from threading import Thread
+from urllib.parse import parse_qs, urlsplit
+
+from pytest import fixture, mark, raises
+
+from .bugs import BugzillaFetcher, closed_bugs, load_snapshot, save_snapshot
+from .main import main
+from .prefpicker import PrefPicker, SourceDataError
+
+TEMPLATE = """
+variant: []
+pref:
+  test.a:
+    review_on_close: [1, 2]
+    variants:
+      default: [1]
+  test.b:
+    review_on_close: [3]
+    variants:
+      default: [1]
+"""
+
+STATUSES = {1: "RESOLVED", 2: "NEW", 3: "VERIFIED", 4: "CLOSED"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """handle Bugzilla REST API bug requests"""
+        url = urlsplit(self.path)
+        self.server.requests.append((self.client_address, self.headers, url))
+        if url.path != "/rest/bug":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        bugs = [int(x) for x in parse_qs(url.query)["id"][0].split(",")]
+        body = dumps(
+            {"bugs": [{"id": x, "status": STATUSES[x]} for x in bugs if x in STATUSES]}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+@fixture(name="bugzilla")
+def fixture_bugzilla():
+    """local HTTP server that behaves like Bugzilla"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.requests = []
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_bugs_01(tmp_path):
+    """test closed_bugs() and snapshots"""
+    yml = tmp_path / "test.yml"
+    yml.write_text(TEMPLATE)
+    picker = PrefPicker.load_template(yml)
+    assert list(closed_bugs(picker, STATUSES)) == [
+        (1, "RESOLVED", ["test.a"]),
+        (3, "VERIFIED", ["test.b"]),
+    ]
+    snapshot = tmp_path / "snapshot.json"
+    save_snapshot(snapshot, STATUSES)
+    assert load_snapshot(snapshot) == STATUSES
+    # map of bug to status
+    snapshot.write_text(dumps({"1": "NEW"}))
+    assert load_snapshot(snapshot) == {1: "NEW"}
+    # invalid snapshots
+    for data in ("{", "[]", '{"bugs": [{}]}', '{"x": "NEW"}'):
+        snapshot.write_text(data)
+        with raises(SourceDataError):
+            load_snapshot(snapshot)
+
+
+@mark.parametrize("concurrency", [1, 2])
+def test_bugs_02(bugzilla, concurrency):
+    """test BugzillaFetcher"""
+    url = f"http://127.0.0.1:{bugzilla.server_port}"
+    with BugzillaFetcher(
+        url, api_key="key", batch=2, concurrency=concurrency
+    ) as fetcher:
+        assert fetcher([5, 4, 3, 2, 1, 1]) == STATUSES
+        assert fetcher([1]) == {1: "RESOLVED"}
+    assert len(bugzilla.requests) == 4
+    assert all(x[1]["X-BUGZILLA-API-KEY"] == "key" for x in bugzilla.requests)
+    assert sorted(parse_qs(x[2].query)["id"][0] for x in bugzilla.requests) == [
+        "1",
+        "1,2",
+        "3,4",
+        "5",
+    ]
+    # connections are reused
+    assert len({x[0] for x in bugzilla.requests}) <= concurrency
+
+
+def test_bugs_03(bugzilla):
+    """test BugzillaFetcher failures"""
+    with raises(ValueError, match="invalid url"):
+        BugzillaFetcher("ftp://example.com")
+    url = f"http://127.0.0.1:{bugzilla.server_port}"
+    with BugzillaFetcher(f"{url}/x") as fetcher, raises(OSError, match="HTTP 404"):
+        fetcher([1])
+    bugzilla.server_close()
+    with (
+        BugzillaFetcher(url) as fetcher,
+        raises(OSError, match="Bugzilla request failed"),
+    ):
+        fetcher([1])
+
+
+def test_bugs_04(bugzilla, caplog, tmp_path):
+    """test main() bugs command"""
+    yml = tmp_path / "test.yml"
+    yml.write_text(TEMPLATE)
+    snapshot = tmp_path / "snapshot.json"
+    snapshot.write_text(dumps({"1": "RESOLVED", "2": "NEW"}))
+    assert main(["bugs", str(yml), "--snapshot", str(snapshot)]) == 0
+    assert "Bug 1 is RESOLVED, review: test.a" in caplog.messages
+    assert "Status unknown: 3" in caplog.messages
+    # fetch and save snapshot
+    caplog.clear()
+    saved = tmp_path / "saved.json"
+    url = f"http://127.0.0.1:{bugzilla.server_port}"
+    assert main(["bugs", str(yml), "--fetch", "--url", url, "--save", str(saved)]) == 0
+    assert "Bug 3 is VERIFIED, review: test.b" in caplog.messages
+    assert len(loads(saved.read_text())["bugs"]) == 3
+    # invalid snapshot
+    snapshot.write_text("[]")
+    assert main(["bugs", str(yml), "--snapshot", str(snapshot)]) == 1
+    # invalid template
+    yml.write_text("variant: []")
+    assert main(["bugs", str(yml), "--snapshot", str(saved)]) == 1
+    # invalid arguments
+    with raises(SystemExit):
+        main(["bugs", str(yml)])
+    with raises(SystemExit):
+        main(["bugs", str(yml), "--snapshot", str(saved), "--save", str(saved)])
+    with raises(SystemExit):
+        main(["bugs", str(yml), "--fetch", "--batch", "0"])
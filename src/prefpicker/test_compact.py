@@ -0,0 +1,129 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+"""compact.py tests"""
+
+from pytest import mark, raises
+
+from .compact import AssignmentEncoder, CompactAssignment
+from .prefpicker import PrefPicker, SourceDataError
+from .prefsjs import parse_prefsjs
+
+TEMPLATE = {
+    "variant": ["v1"],
+    "pref": {
+        "test.a": {"variants": {"default": [1, True, None], "v1": ["x"]}},
+        "test.b": {"variants": {"default": [None, False, True]}},
+        "test.c": {"variants": {"default": [None]}},
+    },
+}
+
+
+def test_compact_01():
+    """test AssignmentEncoder encode() and decode()"""
+    encoder = AssignmentEncoder(PrefPicker.from_data(TEMPLATE))
+    assert encoder.prefs == ("test.a", "test.b", "test.c")
+    assert encoder.variants == ("default", "v1")
+    compact = encoder.encode({"test.a": True, "test.b": True})
+    assert compact.variant == 0
+    assert list(compact.indexes) == [1, 2, 0]
+    assert encoder.decode(compact) == (
+        {"test.a": True, "test.b": True, "test.c": None},
+        "default",
+    )
+    compact = encoder.encode({"test.a": "x", "test.b": False}, variant="v1")
+    assert compact.variant == 1
+    assert list(compact.indexes) == [0, 1, 0]
+    # token round trip
+    token = compact.token()
+    assert CompactAssignment.from_token(token) == compact
+    assert hash(CompactAssignment.from_token(token)) == hash(compact)
+    assert compact != encoder.encode({"test.a": 1})
+    assert compact != token
+    # render prefs.js and read it back
+    result = parse_prefsjs(encoder.render(compact).splitlines())
+    assert result.variant == "v1"
+    assert result.prefs == {"test.a": "x", "test.b": False}
+    assert encoder.from_prefsjs(result) == compact
+    # prefs only defined by --json are ignored
+    result.json_prefs.add("test.x")
+    assert encoder.from_prefsjs(result) == compact
+    # template prefs overridden by --json cannot be encoded
+    result.json_prefs.add("test.a")
+    with raises(SourceDataError, match=r"'test\.a' is overridden by --json"):
+        encoder.from_prefsjs(result)
+
+
+def test_compact_02():
+    """test AssignmentEncoder digest"""
+    encoder = AssignmentEncoder(PrefPicker.from_data(TEMPLATE))
+    assert len(encoder.digest) == 8
+    assert encoder.digest == AssignmentEncoder(PrefPicker.from_data(TEMPLATE)).digest
+    # changing the type of a value changes the digest
+    prefs = {"test.a": {"variants": {"default": [1], "v1": [2]}}}
+    other = AssignmentEncoder(PrefPicker.from_data({"variant": ["v1"], "pref": prefs}))
+    prefs = {"test.a": {"variants": {"default": [True], "v1": [2]}}}
+    ppick = PrefPicker.from_data({"variant": ["v1"], "pref": prefs})
+    assert other.digest != AssignmentEncoder(ppick).digest
+    # decode with wrong template
+    with raises(SourceDataError, match="not created from this template"):
+        other.decode(encoder.encode({}))
+
+
+@mark.parametrize(
+    "values, variant, msg",
+    [
+        ({"test.a": 2}, "default", r"2 is not an option \(test\.a\)"),
+        ({"test.a": "x"}, "default", r"'x' is not an option \(test\.a\)"),
+        ({"test.b": 1}, "default", r"1 is not an option \(test\.b\)"),
+        ({}, "missing", "Variant 'missing' does not exist"),
+    ],
+)
+def test_compact_03(values, variant, msg):
+    """test AssignmentEncoder.encode() with invalid values"""
+    encoder = AssignmentEncoder(PrefPicker.from_data(TEMPLATE))
+    with raises(SourceDataError, match=msg):
+        encoder.encode(values, variant)
+
+
+def test_compact_04():
+    """test invalid compact assignments"""
+    encoder = AssignmentEncoder(PrefPicker.from_data(TEMPLATE))
+    raw = encoder.encode({}).to_bytes()
+    # invalid variant
+    with raises(SourceDataError, match="invalid compact assignment"):
+        encoder.decode(CompactAssignment.from_bytes(raw[:8] + b"\x09" + raw[9:]))
+    # invalid length
+    with raises(SourceDataError, match="invalid compact assignment"):
+        encoder.decode(CompactAssignment.from_bytes(raw[:-1]))
+    # invalid option index
+    with raises(SourceDataError, match=r"invalid option index \(test\.c\)"):
+        encoder.decode(CompactAssignment.from_bytes(raw[:-1] + b"\x01"))
+    # invalid data
+    with raises(SourceDataError, match="invalid compact assignment"):
+        CompactAssignment.from_bytes(raw[:8])
+    with raises(SourceDataError, match="invalid token"):
+        CompactAssignment.from_token("a")
+    with raises(SourceDataError, match="invalid token"):
+        CompactAssignment.from_token("ÿ")
+
+
+def test_compact_05():
+    """test AssignmentEncoder with too many options"""
+    ppick = PrefPicker.from_data(
+        {"variant": [], "pref": {"test.a": {"variants": {"default": list(range(257))}}}}
+    )
+    with raises(SourceDataError, match="too many options"):
+        AssignmentEncoder(ppick)
+
+
+def test_compact_06():
+    """test AssignmentEncoder with built-in template"""
+    template = PrefPicker.lookup_template("browser-fuzzing.yml")
+    ppick = PrefPicker.load_template(template)
+    encoder = AssignmentEncoder(ppick)
+    for variant in ppick.variants:
+        values = ppick.select(variant)
+        compact = encoder.encode(values, variant)
+        assert len(compact.to_bytes()) == len(ppick.prefs) + 9
+        assert encoder.decode(compact) == (values, variant)
@@ -0,0 +1,134 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+"""dedupe.py tests"""
+
+from array import array
+
+from .compact import CompactAssignment
+from .dedupe import SeenSet, UniquePicker
+from .prefpicker import PrefPicker
+from .prefsjs import read_prefsjs
+
+
+def test_dedupe_01():
+    """test SeenSet"""
+    seen = SeenSet(size=2)
+    entries = [CompactAssignment(b"d" * 8, 0, array("B", [x])) for x in range(3)]
+    assert seen.add(entries[0])
+    assert not seen.add(entries[0])
+    assert entries[0] in seen
+    assert "x" not in seen
+    # each variant is tracked separately
+    other = CompactAssignment(b"d" * 8, 1, array("B", [0]))
+    assert other not in seen
+    assert seen.add(other)
+    assert len(seen) == 2
+    # least recently used entry is removed
+    assert seen.add(entries[1])
+    assert not seen.add(entries[0])
+    assert seen.add(entries[2])
+    assert entries[0] in seen
+    assert entries[1] not in seen
+    assert entries[2] in seen
+
+
+def test_dedupe_02():
+    """test UniquePicker.select() enumerates small variants"""
+    ppick = PrefPicker.from_data(
+        {
+            "variant": ["v1"],
+            "pref": {
+                "test.a": {"variants": {"default": [0, 1, 2], "v1": [9]}},
+                "test.b": {"variants": {"default": [True, False]}},
+            },
+        }
+    )
+    upick = UniquePicker(ppick, attempts=1)
+    results = {tuple(sorted(upick.select().items())) for _ in range(6)}
+    # all combinations were used exactly once
+    assert len(results) == 6
+    assert upick.exhausted == 0
+    # all combinations have been used
+    upick.select()
+    assert upick.exhausted == 1
+    # variants are tracked separately
+    upick.select("v1")
+    assert upick.exhausted == 1
+
+
+def test_dedupe_03(tmp_path):
+    """test UniquePicker avoids duplicates"""
+    ppick = PrefPicker.from_data(
+        {
+            "variant": ["v1"],
+            "pref": {
+                "test.a": {"variants": {"default": list(range(256)), "v1": [1]}},
+                "test.b": {"variants": {"default": [None]}},
+            },
+        }
+    )
+    upick = UniquePicker(ppick, seen=SeenSet(size=10), attempts=1000)
+    values = {upick.select()["test.a"] for _ in range(10)}
+    assert len(values) == 10
+    assert upick.exhausted == 0
+    # combinations can't be enumerated (more than seen set size)
+    upick = UniquePicker(ppick, seen=SeenSet(size=1), attempts=1)
+    for _ in range(5):
+        upick.select("v1")
+    assert upick.exhausted == 4
+    assert upick.avoided == 0
+    # create prefs.js
+    prefs = tmp_path / "prefs.js"
+    upick.create_prefsjs(prefs, additional_prefs={"test.c": 1})
+    result = read_prefsjs(prefs)
+    assert result.prefs["test.a"] in range(256)
+    assert result.prefs["test.c"] == 1
+
+
+def test_dedupe_04(monkeypatch):
+    """test UniquePicker.avoided"""
+    ppick = PrefPicker.from_data(
+        {
+            "variant": ["v1"],
+            "pref": {"test.a": {"variants": {"default": [0, 1], "v1": [1]}}},
+        }
+    )
+    picks = iter([0, 0, 0, 1])
+    monkeypatch.setattr("prefpicker.dedupe.randrange", lambda _: next(picks))
+    upick = UniquePicker(ppick, attempts=5)
+    assert upick.select()["test.a"] == 0
+    assert upick.avoided == 0
+    assert upick.select()["test.a"] == 1
+    assert upick.avoided == 2
+    assert upick.exhausted == 0
+    # duplicates returned when exhausted are not counted as avoided
+    monkeypatch.setattr("prefpicker.dedupe.randrange", lambda _: 0)
+    upick = UniquePicker(ppick, attempts=5)
+    assert [upick.select()["test.a"] for _ in range(4)] == [0, 1, 0, 0]
+    assert upick.avoided == 5
+    assert upick.exhausted == 2
+
+
+def test_dedupe_05():
+    """test UniquePicker with constraints"""
+    ppick = PrefPicker.from_data(
+        {
+            "variant": ["v1"],
+            "pref": {
+                "test.a": {"variants": {"default": [0, 1], "v1": [1]}},
+                "test.b": {"variants": {"default": [0, 1]}},
+            },
+        }
+    )
+    ppick.add_constraint("test.a", 1, requires={"test.b": [1]})
+    upick = UniquePicker(ppick, attempts=1)
+    results = {tuple(sorted(upick.select().items())) for _ in range(3)}
+    assert results == {
+        (("test.a", 0), ("test.b", 0)),
+        (("test.a", 0), ("test.b", 1)),
+        (("test.a", 1), ("test.b", 1)),
+    }
+    assert upick.exhausted == 0
+    upick.select()
+    assert upick.exhausted == 1
@@ -3,6 +3,8 @@
 # You can obtain one at http://mozilla.org/MPL/2.0/.
 """main.py tests"""
 
+from json import loads
+
 from pytest import raises
 
 from .main import main
@@ -167,3 +169,111 @@ def test_main_11(tmp_path):
     json_file = tmp_path / "list.json"
     json_file.write_text("[1, 2, 3]")
     assert main([str(yml), str(prefs_js), "--json", str(json_file)]) == 1
+
+
+def test_main_12(capsys, caplog, monkeypatch, tmp_path):
+    """test main() with --profile, --cprofile and PREFPICKER_TRACE"""
+    prefs_js = tmp_path / "prefs.js"
+    yml = tmp_path / "test.yml"
+    yml.write_text(
+        """
+        variant: []
+        pref:
+          test.a:
+            variants:
+              default: [1]"""
+    )
+    monkeypatch.delenv("PREFPICKER_TRACE", raising=False)
+    trace = tmp_path / "trace.jsonl"
+    argv = [str(yml), str(prefs_js), "--check", "--profile", str(trace)]
+    assert main(argv) == 0
+    # log output is not mixed with trace output
+    assert "Done." in caplog.text
+    entries = [loads(x) for x in trace.read_text().splitlines()]
+    phases = {x["phase"] for x in entries if "phase" in x}
+    assert phases == {
+        "check_combinations",
+        "check_duplicates",
+        "check_overwrites",
+        "load_template",
+        "render",
+        "select",
+        "verify_data",
+        "write",
+    }
+    counters = entries[-1]["counters"]
+    assert counters["prefs"] == 1
+    assert counters["variants"] == 1
+    assert counters["bytes_written"] == prefs_js.stat().st_size
+    # trace to file using PREFPICKER_TRACE
+    trace.unlink()
+    monkeypatch.setenv("PREFPICKER_TRACE", str(trace))
+    assert main([str(yml), str(prefs_js)]) == 0
+    assert main([str(yml), str(prefs_js)]) == 0
+    assert not capsys.readouterr()[1]
+    assert sum(1 for x in trace.read_text().splitlines() if "counters" in x) == 2
+    # cProfile
+    monkeypatch.delenv("PREFPICKER_TRACE")
+    stats = tmp_path / "stats.prof"
+    assert main([str(yml), str(prefs_js), "--cprofile", str(stats)]) == 0
+    assert stats.is_file()
+
+
+def test_main_13(tmp_path):
+    """test main() with multiple variants"""
+    yml = tmp_path / "test.yml"
+    yml.write_text(
+        """
+        variant: [v1, v2]
+        pref:
+          test.a:
+            variants:
+              default: [1]
+              v1: [2]
+              v2: [3]"""
+    )
+    out_dir = tmp_path / "out"
+    assert main([str(yml), str(out_dir), "--variant", "all"]) == 0
+    assert sorted(x.name for x in out_dir.iterdir()) == [
+        "prefs-default.js",
+        "prefs-v1.js",
+        "prefs-v2.js",
+    ]
+    assert 'user_pref("test.a", 2);' in (out_dir / "prefs-v1.js").read_text()
+    out_dir = tmp_path / "out2"
+    assert main([str(yml), str(out_dir), "--variant", "v1,v2"]) == 0
+    assert sorted(x.name for x in out_dir.iterdir()) == ["prefs-v1.js", "prefs-v2.js"]
+    # unknown variant
+    assert main([str(yml), str(tmp_path / "out3"), "--variant", "v1,x"]) == 1
+    # output is a file
+    with raises(SystemExit):
+        main([str(yml), str(yml), "--variant", "all"])
+    # empty list
+    with raises(SystemExit):
+        main([str(yml), str(out_dir), "--variant", ","])
+
+
+def test_main_14(caplog, tmp_path):
+    """test main() with --check and --campaign"""
+    prefs_js = tmp_path / "prefs.js"
+    yml = tmp_path / "test.yml"
+    yml.write_text(
+        """
+        variant: []
+        pref:
+          test.a:
+            variants:
+              default: [1, 2]
+          test.b:
+            variants:
+              default: [true, false]"""
+    )
+    assert main([str(yml), str(prefs_js), "--check", "--campaign", "4"]) == 0
+    assert (
+        "Check: 'default' variant has 2.0 bits of entropy, 4 files are expected to"
+        " use 68.4% of value pairs and contain 1.3 duplicate(s)"
+    ) in caplog.messages
+    with raises(SystemExit):
+        main([str(yml), str(prefs_js), "--campaign", "4"])
+    with raises(SystemExit):
+        main([str(yml), str(prefs_js), "--check", "--campaign", "0"])
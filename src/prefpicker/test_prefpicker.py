@@ -3,9 +3,11 @@
 # You can obtain one at http://mozilla.org/MPL/2.0/.
 """prefpicker.py tests"""
 
-from pytest import mark, raises
+from pytest import approx, mark, raises
 
-from .prefpicker import PrefPicker, SourceDataError
+from .prefpicker import Pref, PrefPicker, SourceDataError
+
+PREF = {"a.b": {"variants": {"default": [1]}}}
 
 
 def test_prefpicker_01(tmp_path):
@@ -81,6 +83,113 @@ def test_prefpicker_01(tmp_path):
             {"variant": [], "pref": {"a.b": {"variants": {"default": [1.11]}}}},
             r"unsupported datatype 'float' \(a\.b\)",
         ),
+        # review_on_close is invalid type
+        (
+            {
+                "variant": [],
+                "pref": {"a.b": {"review_on_close": 1, "variants": {"default": [1]}}},
+            },
+            r"'review_on_close' in 'a\.b' must be a list of bug numbers",
+        ),
+        # review_on_close contains invalid entry
+        (
+            {
+                "variant": [],
+                "pref": {
+                    "a.b": {"review_on_close": [True], "variants": {"default": [1]}}
+                },
+            },
+            r"'review_on_close' in 'a\.b' must be a list of bug numbers",
+        ),
+        # constraint is invalid type
+        (
+            {"variant": [], "pref": PREF, "constraint": {}},
+            "constraint is not a list",
+        ),
+        # constraint entry is invalid type
+        (
+            {"variant": [], "pref": PREF, "constraint": [[]]},
+            "constraint entry must contain a dict",
+        ),
+        # constraint with unknown key
+        (
+            {"variant": [], "pref": PREF, "constraint": [{"x": 1}]},
+            "unknown constraint key",
+        ),
+        # constraint with undefined pref
+        (
+            {"variant": [], "pref": PREF, "constraint": [{"pref": "x.y"}]},
+            r"constraint pref 'x\.y' is not defined",
+        ),
+        # constraint missing value
+        (
+            {
+                "variant": [],
+                "pref": {"a.b": {"variants": {"default": [1]}}},
+                "constraint": [{"pref": "a.b"}],
+            },
+            r"constraint for 'a\.b' is missing 'value'",
+        ),
+        # constraint value is not an option (type mismatch)
+        (
+            {
+                "variant": [],
+                "pref": {"a.b": {"variants": {"default": [1]}}},
+                "constraint": [{"pref": "a.b", "value": True}],
+            },
+            r"constraint value True is not a value of 'a\.b'",
+        ),
+        # constraint missing requires and conflicts
+        (
+            {
+                "variant": [],
+                "pref": {"a.b": {"variants": {"default": [1]}}},
+                "constraint": [{"pref": "a.b", "value": 1}],
+            },
+            r"constraint for 'a\.b' is missing 'requires' or 'conflicts'",
+        ),
+        # constraint requires is invalid
+        (
+            {
+                "variant": [],
+                "pref": {"a.b": {"variants": {"default": [1]}}},
+                "constraint": [{"pref": "a.b", "value": 1, "requires": []}],
+            },
+            r"'requires' in constraint for 'a\.b' must be a dict",
+        ),
+        # constraint conflicts with self
+        (
+            {
+                "variant": [],
+                "pref": {"a.b": {"variants": {"default": [1]}}},
+                "constraint": [{"pref": "a.b", "value": 1, "conflicts": {"a.b": [1]}}],
+            },
+            r"'conflicts' in constraint for 'a\.b' contains invalid pref 'a\.b'",
+        ),
+        # constraint target values invalid
+        (
+            {
+                "variant": [],
+                "pref": {
+                    "a.b": {"variants": {"default": [1]}},
+                    "c.d": {"variants": {"default": [1]}},
+                },
+                "constraint": [{"pref": "a.b", "value": 1, "requires": {"c.d": []}}],
+            },
+            r"'c\.d' in constraint for 'a\.b' must be a list",
+        ),
+        # constraint target value is not an option
+        (
+            {
+                "variant": [],
+                "pref": {
+                    "a.b": {"variants": {"default": [1]}},
+                    "c.d": {"variants": {"default": [1]}},
+                },
+                "constraint": [{"pref": "a.b", "value": 1, "requires": {"c.d": [2]}}],
+            },
+            r"constraint value 2 is not a value of 'c\.d'",
+        ),
     ],
 )
 def test_prefpicker_02(data, msg):
@@ -357,3 +466,250 @@ def test_prefpicker_13(tmp_path):
     assert "// 'test.b' defined by --json override" in prefs_data
     # None values from JSON-only prefs should be skipped
     assert "test.skip" not in prefs_data
+
+
+def test_prefpicker_14(tmp_path):
+    """test PrefPicker.select() with constraints"""
+    yml = tmp_path / "test.yml"
+    yml.write_text(
+        """
+        constraint:
+        - pref: test.a
+          value: true
+          requires:
+            test.b: [1, 2]
+          conflicts:
+            test.c: [null]
+        - pref: test.b
+          value: 2
+          requires:
+            test.d: ["x"]
+        variant: [v1]
+        pref:
+          test.a:
+            variants:
+              default: [true, false]
+              v1: [true]
+          test.b:
+            variants:
+              default: [0, 1, 2]
+          test.c:
+            variants:
+              default: [null, 1, true]
+          test.d:
+            variants:
+              default: ["x", "y"]
+          test.e:
+            variants:
+              default: [1, 2]"""
+    )
+    ppick = PrefPicker.load_template(yml)
+    assert len(ppick.constraints["test.a"]) == 2
+    assert len(ppick.constraints["test.b"]) == 1
+    seen = set()
+    for _ in range(100):
+        values = ppick.select()
+        assert ppick.satisfies_constraints(values)
+        if values["test.a"]:
+            assert values["test.b"] in (1, 2)
+            assert values["test.c"] is not None
+        if values["test.b"] == 2:
+            assert values["test.d"] == "x"
+        seen.add(values["test.a"])
+    assert seen == {True, False}
+    # variant forces constraint
+    for _ in range(10):
+        values = ppick.select("v1")
+        assert values["test.b"] in (1, 2)
+        assert values["test.c"] in (1, True)
+    # values that violate constraints
+    assert not ppick.satisfies_constraints({"test.a": True, "test.b": 0})
+    assert not ppick.satisfies_constraints({"test.a": True, "test.b": 1})
+    assert ppick.satisfies_constraints({"test.a": 1, "test.b": 0})
+
+
+def test_prefpicker_15():
+    """test PrefPicker.select() with constraints that cannot be satisfied"""
+    raw_data = {
+        "variant": ["v1"],
+        "pref": {
+            "test.a": {"variants": {"default": [1], "v1": [2]}},
+            "test.b": {"variants": {"default": [1, 2]}},
+        },
+    }
+    PrefPicker.verify_data(raw_data)
+    ppick = PrefPicker()
+    ppick.variants = set(raw_data["variant"] + ["default"])
+    ppick.prefs = raw_data["pref"]
+    ppick.add_constraint("test.a", 2, requires={"test.b": [1]})
+    ppick.add_constraint("test.b", 1, conflicts={"test.a": [2]})
+    # constraints only apply to variant 'v1'
+    assert ppick.select() in ({"test.a": 1, "test.b": 1}, {"test.a": 1, "test.b": 2})
+    with raises(SourceDataError, match=r"constraints cannot be satisfied \(v1\)"):
+        ppick.select("v1")
+
+
+def test_prefpicker_16():
+    """test Pref"""
+    cache = {}
+    pref = Pref.from_variants({"default": [1, None], "v1": [True]}, cache)
+    assert pref.default == (1, None)
+    assert pref.overrides == {"v1": (True,)}
+    assert pref.options() == (1, None)
+    assert pref.options("v1") == (True,)
+    assert pref.options("missing") == (1, None)
+    assert list(pref.items()) == [("default", (1, None)), ("v1", (True,))]
+    assert list(pref.values()) == [(1, None), (True,)]
+    # read-only view of the raw template entry
+    assert pref["variants"] == {"default": (1, None), "v1": (True,)}
+    with raises(TypeError):
+        pref["variants"]["v2"] = (1,)  # type: ignore[index]
+    with raises(KeyError):
+        pref["missing"]  # pylint: disable=pointless-statement
+    # identical options are shared but True and 1 are not treated as equal
+    other = Pref.from_variants({"default": [1, None], "v2": [1]}, cache)
+    assert other.default is pref.default
+    assert other.options("v2") == (1,)
+    assert not isinstance(other.options("v2")[0], bool)
+    # only 'default'
+    pref = Pref.from_variants({"default": [1]})
+    assert pref.overrides is None
+    assert list(pref.items()) == [("default", (1,))]
+    assert pref == Pref((1,))
+    assert pref != Pref((1,), {"v1": (2,)})
+    assert pref != 1
+    with raises(SourceDataError, match="missing 'default' variant"):
+        Pref.from_variants({"v1": [1]})
+
+
+def test_prefpicker_17():
+    """test PrefPicker.prefs setter"""
+    ppick = PrefPicker()
+    ppick.prefs = {
+        "test.a": {"variants": {"default": [1], "v1": [2]}},
+        "test.b": Pref((True,)),
+    }
+    assert ppick.prefs["test.a"] == Pref((1,), {"v1": (2,)})
+    assert ppick.prefs["test.b"] == Pref((True,))
+    assert ppick.options("test.a", "v1") == (2,)
+
+
+def test_prefpicker_18(tmp_path):
+    """test PrefPicker.create_prefsjs_variants()"""
+    ppick = PrefPicker()
+    ppick.variants = {"default", "v1", "v2"}
+    ppick.prefs = {
+        "test.a": {"variants": {"default": list(range(100))}},
+        "test.b": {"variants": {"default": [1, 2], "v1": [3]}},
+        "test.c": {"variants": {"default": [True, False]}},
+        "test.d": {"variants": {"default": [1, 2]}},
+    }
+    ppick.add_constraint("test.c", True, requires={"test.d": [1]})
+    # only prefs that are not overridden or constrained are shared
+    assert set(ppick.select_shared()) == {"test.a"}
+    created = ppick.create_prefsjs_variants(
+        tmp_path, ["default", "v1", "v2"], additional_prefs={"test.x": 5}
+    )
+    assert sorted(x.name for x in created.values()) == [
+        "prefs-default.js",
+        "prefs-v1.js",
+        "prefs-v2.js",
+    ]
+    shared = set()
+    for variant, path in created.items():
+        lines = path.read_text().splitlines()
+        assert f"// Variant {variant!r}" in lines
+        assert 'user_pref("test.x", 5);' in lines
+        shared.update(x for x in lines if x.startswith('user_pref("test.a"'))
+        if variant == "v1":
+            assert 'user_pref("test.b", 3);' in lines
+            assert "// 'test.b' defined by variant 'v1'" in lines
+        if 'user_pref("test.c", true);' in lines:
+            assert 'user_pref("test.d", 1);' in lines
+    # shared pref has the same value in all files
+    assert len(shared) == 1
+
+
+def test_prefpicker_19(tmp_path):
+    """test PrefPicker.review_on_close"""
+    yml = tmp_path / "test.yml"
+    yml.write_text(
+        """
+        variant: []
+        pref:
+          test.a:
+            review_on_close: [123, 456]
+            variants:
+              default: [1]
+          test.b:
+            review_on_close: [123]
+            variants:
+              default: [1]
+          test.c:
+            variants:
+              default: [1]"""
+    )
+    picker = PrefPicker.load_template(yml)
+    assert picker.review_on_close == {123: ["test.a", "test.b"], 456: ["test.a"]}
+
+
+def test_prefpicker_20():
+    """test PrefPicker.check_coverage()"""
+    ppick = PrefPicker()
+    ppick.variants = {"default", "v1"}
+    ppick.prefs = {
+        "test.a": {"variants": {"default": [1, 2], "v1": [1]}},
+        "test.b": {"variants": {"default": [True, False]}},
+        "test.c": {"variants": {"default": [1, 2, 3, 4]}},
+        "test.d": {"variants": {"default": [None]}},
+    }
+    results = {x[0]: x[1:] for x in ppick.check_coverage(1)}
+    # default: 2 * 2 * 4 = 16 combinations
+    entropy, coverage, duplicates = results["default"]
+    assert entropy == approx(4)
+    # 3 of 4 + 8 + 8 value pairs are used by a single file
+    assert coverage == approx(3 / 20)
+    assert duplicates == approx(0)
+    # v1: only test.b and test.c have multiple options (8 combinations)
+    entropy, coverage, duplicates = results["v1"]
+    assert entropy == approx(3)
+    assert coverage == approx(1 / 8)
+    # expected duplicates: N - C(1 - (1 - 1/C)^N)
+    results = {x[0]: x[1:] for x in ppick.check_coverage(10)}
+    assert results["v1"][2] == approx(10 - 8 * (1 - (7 / 8) ** 10))
+    assert 0 < results["default"][1] < 1
+    # a single combination
+    ppick.prefs = {"test.a": {"variants": {"default": [1]}}}
+    assert list(ppick.check_coverage(5)) == [
+        ("default", 0, 1.0, 4),
+        ("v1", 0, 1.0, 4),
+    ]
+
+
+def test_prefpicker_21():
+    """test PrefPicker.select() backtracks when a pick leaves no valid values"""
+    prefs = {
+        "a": {"variants": {"default": [0, 1]}},
+        "b": {"variants": {"default": [0, 1, 2]}},
+        "c": {"variants": {"default": [0, 1, 2]}},
+        "d": {"variants": {"default": [0, 1, 2]}},
+    }
+    # a=0 requires b, c and d to be 0 or 1
+    constraints = [
+        {"pref": "a", "value": 0, "requires": {"b": [0, 1], "c": [0, 1], "d": [0, 1]}}
+    ]
+    # b, c and d must all be different
+    for pref in ("b", "c", "d"):
+        others = [x for x in ("b", "c", "d") if x != pref]
+        constraints.extend(
+            {"pref": pref, "value": x, "conflicts": {y: [x] for y in others}}
+            for x in range(3)
+        )
+    ppick = PrefPicker.from_data(
+        {"variant": [], "pref": prefs, "constraint": constraints}
+    )
+    for _ in range(50):
+        values = ppick.select()
+        assert values["a"] == 1
+        assert sorted((values["b"], values["c"], values["d"])) == [0, 1, 2]
+        assert ppick.satisfies_constraints(values)
@@ -0,0 +1,80 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+"""prefsjs.py tests"""
+
+from pytest import mark, raises
+
+from .prefpicker import PrefPicker, SourceDataError
+from .prefsjs import parse_prefsjs, read_prefsjs, read_prefsjs_files, scan_prefsjs
+
+
+def test_prefsjs_01(tmp_path):
+    """test read_prefsjs() with output from PrefPicker.create_prefsjs()"""
+    raw_data = {
+        "variant": ["v1"],
+        "pref": {
+            "test.a": {"variants": {"default": [0], "v1": [1]}},
+            "test.b": {"variants": {"default": [None, None]}},
+            "test.c": {"variants": {"default": ["'quoted' \"str\""]}},
+            "test.d": {"variants": {"default": [True, False]}},
+            "test.e": {"variants": {"default": [None]}},
+        },
+    }
+    ppick = PrefPicker.from_data(raw_data)
+    prefs = tmp_path / "prefs.js"
+    ppick.create_prefsjs(prefs, variant="v1", additional_prefs={"test.x": -5})
+    result = read_prefsjs(prefs)
+    assert result.version
+    assert result.variant == "v1"
+    assert result.prefs["test.a"] == 1
+    assert result.prefs["test.b"] is None
+    assert result.prefs["test.c"] == "'quoted' \"str\""
+    assert result.prefs["test.d"] in (True, False)
+    assert "test.e" not in result.prefs
+    assert result.prefs["test.x"] == -5
+    assert result.options == {"test.b": [None, None], "test.d": [True, False]}
+    assert result.json_prefs == {"test.x"}
+
+
+@mark.parametrize(
+    "data",
+    [
+        "junk\n",
+        'user_pref("a", 1)\n',
+        'user_pref("a" 1);\n',
+        'user_pref("a", 1.1);\n',
+        'user_pref("a", );\n',
+        "user_pref(\"a\", '1' + '2');\n",
+        "// 'a' options [1, \n",
+    ],
+)
+def test_prefsjs_02(data):
+    """test parse_prefsjs() with invalid data"""
+    with raises(SourceDataError, match=r"invalid prefs\.js entry \(line 2\)"):
+        parse_prefsjs(["// Variant 'default'\n", data])
+
+
+@mark.parametrize("workers", [1, 2])
+def test_prefsjs_03(tmp_path, workers):
+    """test read_prefsjs_files() and scan_prefsjs()"""
+    (tmp_path / "sub").mkdir()
+    for idx, path in enumerate((tmp_path / "a.js", tmp_path / "sub" / "b.js")):
+        path.write_text(f"// Variant 'v{idx}'\nuser_pref(\"a.b\", {idx});\n")
+    (tmp_path / "ignored.txt").touch()
+    files = tuple(scan_prefsjs(tmp_path))
+    assert len(files) == 2
+    results = tuple(read_prefsjs_files(files, workers=workers))
+    assert [x[0] for x in results] == list(files)
+    assert results[0][1].variant == "v0"
+    assert results[0][1].prefs == {"a.b": 0}
+    assert results[1][1].variant == "v1"
+    assert results[1][1].prefs == {"a.b": 1}
+    # invalid files do not stop reading
+    bad = tmp_path / "bad.js"
+    bad.write_text("// Variant 'v0'\nbad\n")
+    results = tuple(read_prefsjs_files((bad, *files), workers=workers))
+    assert isinstance(results[0][1], SourceDataError)
+    assert str(results[0][1]) == f"'{bad}': invalid prefs.js entry (line 2)"
+    assert results[1][1].prefs == {"a.b": 0}
+    assert results[2][1].prefs == {"a.b": 1}
@@ -0,0 +1,43 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+"""profiling.py tests"""
+
+from io import StringIO
+from json import loads
+
+from pytest import raises
+
+from .profiling import Tracer
+
+
+def test_profiling_01():
+    """test disabled Tracer"""
+    tracer = Tracer()
+    assert not tracer.enabled
+    with tracer.phase("a"):
+        pass
+    tracer.count("a")
+    assert not tracer.counters
+    tracer.disable()
+
+
+def test_profiling_02():
+    """test enabled Tracer"""
+    out = StringIO()
+    tracer = Tracer()
+    tracer.enable(out)
+    assert tracer.enabled
+    with tracer.phase("outer"), tracer.phase("inner"):
+        tracer.count("a")
+        tracer.count("a", 2)
+    # phase is recorded when an exception is raised
+    with raises(RuntimeError), tracer.phase("fail"):
+        raise RuntimeError()
+    tracer.disable()
+    assert not tracer.enabled
+    assert not tracer.counters
+    entries = [loads(x) for x in out.getvalue().splitlines()]
+    assert [x.get("phase") for x in entries] == ["inner", "outer", "fail", None]
+    assert all(x["duration"] >= 0 for x in entries[:3])
+    assert entries[-1] == {"counters": {"a": 3}}
@@ -0,0 +1,122 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+"""reduce.py tests"""
+
+from shlex import join
+from sys import executable
+
+from pytest import mark, raises
+
+from .main import main
+from .prefpicker import PrefPicker, SourceDataError
+from .prefsjs import Assignment, read_prefsjs
+from .reduce import PrefReducer
+
+# fail when the prefs.js contains all of the given arguments
+SCRIPT = (
+    "import sys; data = open(sys.argv[1]).read();"
+    " sys.exit(int(all(x in data for x in sys.argv[2:])))"
+)
+
+
+@mark.parametrize("jobs", [1, 4])
+def test_reduce_01(tmp_path, jobs):
+    """test PrefReducer.run()"""
+    prefs = {
+        f"test.{x:02d}": {"variants": {"default": [0], "v1": [1]}} for x in range(20)
+    }
+    ppick = PrefPicker.from_data({"variant": ["v1"], "pref": prefs})
+    assignment = Assignment()
+    assignment.variant = "v1"
+    assignment.prefs = {f"test.{x:02d}": 1 for x in range(20)}
+    assignment.prefs["test.json"] = "x"
+    cmd = [executable, "-c", SCRIPT, "{prefs}", '"test.05", 1', '"test.json", ']
+    reducer = PrefReducer(ppick, assignment, cmd, tmp_path, jobs=jobs)
+    assert len(reducer.changes) == 21
+    assert reducer.run() == ["test.05", "test.json"]
+    assert reducer.tests > 0
+    assert not any(tmp_path.iterdir())
+    prefs_data = reducer.render(frozenset(["test.05"]))
+    assert 'user_pref("test.05", 1);' in prefs_data
+    assert 'user_pref("test.06", 0);' in prefs_data
+    assert "test.json" not in prefs_data
+
+
+def test_reduce_02(tmp_path):
+    """test PrefReducer.run() corner cases"""
+    ppick = PrefPicker.from_data(
+        {
+            "variant": ["v1"],
+            "pref": {
+                "test.a": {"variants": {"default": [0, 1], "v1": [2]}},
+                "test.b": {"variants": {"default": [None], "v1": [True]}},
+                "test.c": {"variants": {"default": [False]}},
+            },
+        }
+    )
+    assignment = Assignment()
+    assignment.prefs = {"test.a": 1, "test.c": False}
+    # value of 'default' variant with multiple options is removed
+    reducer = PrefReducer(ppick, assignment, [executable, "-c", SCRIPT], tmp_path)
+    assert reducer.changes == ["test.a"]
+    assert reducer.reverted == {"test.a": None, "test.b": None, "test.c": False}
+    # test always fails
+    assert reducer.run() == []
+    # test never fails
+    cmd = [executable, "-c", SCRIPT, "{prefs}", "missing"]
+    assert PrefReducer(ppick, assignment, cmd, tmp_path).run() is None
+    # test times out
+    cmd = [executable, "-c", "import time; time.sleep(60)"]
+    reducer = PrefReducer(ppick, assignment, cmd, tmp_path, timeout=0.1)
+    assert reducer.run() is None
+    # reverted values are not attributed to the variant
+    assignment.variant = "v1"
+    assignment.prefs = {"test.a": 2, "test.b": True, "test.c": False}
+    reducer = PrefReducer(ppick, assignment, cmd, tmp_path)
+    assert reducer.changes == ["test.a", "test.b"]
+    lines = reducer.render(frozenset(["test.b"])).splitlines()
+    assert "// 'test.a' defined by variant 'v1'" not in lines
+    assert "// 'test.a' skipped, options [0, 1]" in lines
+    assert "// 'test.b' defined by variant 'v1'" in lines
+    assert 'user_pref("test.b", true);' in lines
+    # unknown variant
+    assignment.variant = "missing"
+    with raises(SourceDataError, match="Variant 'missing' does not exist"):
+        PrefReducer(ppick, assignment, cmd, tmp_path)
+
+
+def test_reduce_03(caplog, tmp_path):
+    """test main() with 'reduce' command"""
+    yml = tmp_path / "test.yml"
+    yml.write_text(
+        """
+        variant: [v1]
+        pref:
+          test.a:
+            variants:
+              default: [0]
+              v1: [1]
+          test.b:
+            variants:
+              default: [0]
+              v1: [1]"""
+    )
+    prefs_js = tmp_path / "prefs.js"
+    PrefPicker.load_template(yml).create_prefsjs(prefs_js, variant="v1")
+    reduced = tmp_path / "reduced.js"
+    cmd = join([executable, "-c", SCRIPT, "{prefs}", '"test.b", 1'])
+    assert main(["reduce", str(yml), str(prefs_js), str(reduced), "--cmd", cmd]) == 0
+    assert "Required: 'test.b'" in caplog.text
+    result = read_prefsjs(reduced)
+    assert result.variant == "v1"
+    assert result.prefs == {"test.a": 0, "test.b": 1}
+    # test does not fail
+    cmd = join([executable, "-c", SCRIPT, "{prefs}", "missing"])
+    assert main(["reduce", str(yml), str(prefs_js), str(reduced), "--cmd", cmd]) == 1
+    # invalid prefs.js
+    prefs_js.write_text("bad")
+    assert main(["reduce", str(yml), str(prefs_js), str(reduced), "--cmd", cmd]) == 1
+    # unknown variant
+    prefs_js.write_text("// Variant 'x'\n")
+    assert main(["reduce", str(yml), str(prefs_js), str(reduced), "--cmd", cmd]) == 1
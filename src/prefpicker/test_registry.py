@@ -0,0 +1,85 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+"""registry.py tests"""
+
+from os import utime
+
+from pytest import raises
+
+from .registry import TemplateRegistry
+
+TEMPLATE = """
+variant: []
+pref:
+  test.a:
+    variants:
+      default: [%d]
+"""
+
+
+def test_registry_01():
+    """test TemplateRegistry with built-in templates"""
+    registry = TemplateRegistry()
+    assert "browser-fuzzing.yml" in registry.templates()
+    assert registry.get("browser-fuzzing.yml").prefs
+    assert registry.metrics()["misses"] == 1
+    with raises(KeyError):
+        registry.get("missing.yml")
+
+
+def test_registry_02(tmp_path):
+    """test TemplateRegistry search paths"""
+    first = tmp_path / "first"
+    first.mkdir()
+    second = tmp_path / "second"
+    second.mkdir()
+    (first / "a.yml").write_text(TEMPLATE % 1)
+    (second / "a.yml").write_text(TEMPLATE % 2)
+    (second / "b.yml").write_text(TEMPLATE % 3)
+    (second / "c.txt").touch()
+    registry = TemplateRegistry([first, second, tmp_path / "missing"])
+    assert registry.templates() == {"a.yml": first / "a.yml", "b.yml": second / "b.yml"}
+    assert registry.lookup("a.yml") == first / "a.yml"
+    assert registry.lookup("c.yml") is None
+    assert registry.get("a.yml").options("test.a") == (1,)
+    assert registry.get("b.yml").options("test.a") == (3,)
+
+
+def test_registry_03(tmp_path):
+    """test TemplateRegistry caching, invalidation and eviction"""
+    for idx in range(3):
+        (tmp_path / f"{idx}.yml").write_text(TEMPLATE % idx)
+    registry = TemplateRegistry([tmp_path], size=2)
+    first = registry.get("0.yml")
+    assert registry.get("0.yml") is first
+    assert registry.metrics() == {
+        "cached": 1,
+        "evictions": 0,
+        "hits": 1,
+        "misses": 1,
+        "reloads": 0,
+    }
+    # touched but not modified
+    utime(tmp_path / "0.yml", ns=(1, 1))
+    assert registry.get("0.yml") is first
+    assert registry.hits == 2
+    # modified
+    (tmp_path / "0.yml").write_text(TEMPLATE % 10)
+    utime(tmp_path / "0.yml", ns=(2, 2))
+    updated = registry.get("0.yml")
+    assert updated is not first
+    assert updated.options("test.a") == (10,)
+    assert registry.reloads == 1
+    # least recently used entry is evicted
+    registry.get("1.yml")
+    registry.get("0.yml")
+    registry.get("2.yml")
+    assert len(registry) == 2
+    assert registry.evictions == 1
+    registry.get("0.yml")
+    assert registry.misses == 3
+    registry.get("1.yml")
+    assert registry.misses == 4
+    registry.clear()
+    assert len(registry) == 0
@@ -0,0 +1,122 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+"""shared.py tests"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from pytest import raises
+
+from .prefpicker import PrefPicker, SourceDataError
+from .prefsjs import read_prefsjs
+from .shared import SharedPrefPicker, publish_template
+
+
+def _render(path):
+    ppick = SharedPrefPicker.attach(path)
+    try:
+        return ppick.render(ppick.select("v1"), "v1")
+    finally:
+        ppick.close()
+
+
+def test_shared_01(tmp_path):
+    """test publish_template() and SharedPrefPicker"""
+    raw_data = {
+        "variant": ["v1", "vé"],
+        "pref": {
+            "test.a": {"variants": {"default": [0, -(2**63)], "v1": [1]}},
+            "test.b": {"variants": {"default": [None, True, False], "vé": ["é"]}},
+            "test.c": {"variants": {"default": ["x" * 70_000]}},
+        },
+    }
+    PrefPicker.verify_data(raw_data)
+    ppick = PrefPicker()
+    ppick.variants = set(raw_data["variant"] + ["default"])
+    ppick.prefs = raw_data["pref"]
+    ppick.add_constraint("test.a", 1, requires={"test.b": [True]})
+    published = tmp_path / "template.bin"
+    publish_template(ppick, published)
+    shared = SharedPrefPicker.attach(published)
+    try:
+        assert shared.variants == ppick.variants
+        assert dict(shared.prefs) == ppick.prefs
+        assert list(shared.prefs) == ["test.a", "test.b", "test.c"]
+        assert len(shared.prefs) == 3
+        assert "test.b" in shared.prefs
+        assert "test.0" not in shared.prefs
+        assert "test.d" not in shared.prefs
+        assert 1 not in shared.prefs
+        with raises(KeyError):
+            shared.prefs["missing"]  # pylint: disable=pointless-statement
+        assert shared.constraints == ppick.constraints
+        # generate prefs.js
+        prefs = tmp_path / "prefs.js"
+        shared.create_prefsjs(prefs, variant="v1")
+        assert read_prefsjs(prefs).prefs["test.b"] is True
+        assert tuple(shared.check_combinations()) == tuple(ppick.check_combinations())
+        assert dict(shared.prefs.items()) == ppick.prefs
+        # decoded option tables are shared
+        assert shared.prefs["test.a"].default is shared.prefs["test.a"].default
+        # read-only
+        with raises(AttributeError, match="read-only"):
+            shared.prefs = {}
+    finally:
+        shared.close()
+    # attach from other processes
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        results = tuple(executor.map(_render, [published] * 2))
+    assert all('user_pref("test.a", 1);' in x for x in results)
+
+
+def test_shared_02(tmp_path):
+    """test SharedPrefPicker with invalid data"""
+    published = tmp_path / "template.bin"
+    published.touch()
+    with raises(SourceDataError, match="invalid shared template"):
+        SharedPrefPicker.attach(published)
+    published.write_bytes(b"x" * 4)
+    with raises(SourceDataError, match="invalid shared template"):
+        SharedPrefPicker.attach(published)
+    published.write_bytes(b"x" * 100)
+    with raises(SourceDataError, match="invalid shared template"):
+        SharedPrefPicker.attach(published)
+
+
+def test_shared_03(tmp_path):
+    """test publish_template() with unsupported data"""
+    ppick = PrefPicker()
+    ppick.prefs = {"test.a": {"variants": {"default": [2**64]}}}
+    with raises(SourceDataError, match="cannot publish template"):
+        publish_template(ppick, tmp_path / "template.bin")
+    assert not any(tmp_path.iterdir())
+
+
+def test_shared_04(tmp_path):
+    """test unsupported SharedPrefPicker constructors"""
+    with raises(TypeError, match="attach"):
+        SharedPrefPicker.from_data({"variant": [], "pref": {}})
+    with raises(TypeError, match="attach"):
+        SharedPrefPicker.load_template(tmp_path / "template.yml")
+
+
+def test_shared_05(tmp_path):
+    """test SharedPrefs lookups with many prefs"""
+    ppick = PrefPicker.from_data(
+        {
+            "variant": [],
+            "pref": {
+                f"test.{x}": {"variants": {"default": [x % 3]}} for x in range(500)
+            },
+        }
+    )
+    published = tmp_path / "template.bin"
+    publish_template(ppick, published)
+    shared = SharedPrefPicker.attach(published)
+    try:
+        assert all(shared.prefs[x] == ppick.prefs[x] for x in ppick.prefs)
+        assert "test.500" not in shared.prefs
+        # identical option tables are stored and decoded once
+        assert shared.prefs["test.0"].default is shared.prefs["test.3"].default
+    finally:
+        shared.close()
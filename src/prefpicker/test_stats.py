@@ -0,0 +1,116 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+"""stats.py tests"""
+
+from pytest import raises
+
+from .main import main
+from .prefpicker import PrefPicker
+from .prefsjs import Assignment
+from .stats import CrashStats
+
+TEMPLATE = """
+variant: [v1]
+pref:
+  test.a:
+    variants:
+      default: [true, false]
+  test.b:
+    variants:
+      default: [1, 2]
+      v1: [3]
+  test.c:
+    variants:
+      default: [null]
+"""
+
+
+def _assignment(**prefs):
+    assignment = Assignment()
+    assignment.prefs = {k.replace("_", "."): v for k, v in prefs.items()}
+    return assignment
+
+
+def test_stats_01(tmp_path):
+    """test CrashStats"""
+    yml = tmp_path / "test.yml"
+    yml.write_text(TEMPLATE)
+    stats = CrashStats(PrefPicker.load_template(yml))
+    # crashes only when test.a is true and test.b is 2
+    for a_val in (True, False):
+        for b_val in (1, 2, 3):
+            for _ in range(10):
+                stats.add(_assignment(test_a=a_val, test_b=b_val), a_val and b_val == 2)
+    # value not in template is ignored
+    stats.add(_assignment(test_a=True, test_b=99), False)
+    assert stats.total == 61
+    singles = {x.features: x for x in stats.enrichment()}
+    assert set(singles) == {
+        (("test.a", True),),
+        (("test.a", False),),
+        (("test.b", 1),),
+        (("test.b", 2),),
+        (("test.b", 3),),
+    }
+    result = singles[(("test.a", True),)]
+    assert result.total == 31
+    assert result.crashes == 10
+    assert result.others_rate == 0
+    assert result.odds_ratio > 1
+    assert singles[(("test.a", False),)].crashes == 0
+    assert singles[(("test.a", False),)].odds_ratio < 1
+    # pairs
+    results = {x.features: x for x in stats.enrichment(min_count=10, pairs=True)}
+    result = results[(("test.a", True), ("test.b", 2))]
+    assert result.total == 10
+    assert result.crashes == 10
+    assert result.rate == 1
+    assert result.others_rate == 0
+    assert result.p_value < 0.001
+    assert all(x.p_value >= result.p_value for x in results.values())
+    # min_count filters out values
+    assert not tuple(stats.enrichment(min_count=100, pairs=True))
+
+
+def test_stats_02(tmp_path):
+    """test CrashStats without crashes"""
+    yml = tmp_path / "test.yml"
+    yml.write_text(TEMPLATE)
+    stats = CrashStats(PrefPicker.load_template(yml))
+    stats.add(_assignment(test_a=True), False)
+    stats.add(_assignment(test_a=False), False)
+    results = tuple(stats.enrichment())
+    assert len(results) == 2
+    assert all(x.p_value == 1 for x in results)
+
+
+def test_stats_03(capsys, caplog, tmp_path):
+    """test main() with 'stats' command"""
+    yml = tmp_path / "test.yml"
+    yml.write_text(TEMPLATE)
+    ppick = PrefPicker.load_template(yml)
+    crash = tmp_path / "crash"
+    crash.mkdir()
+    no_crash = tmp_path / "no-crash"
+    no_crash.mkdir()
+    for idx in range(10):
+        ppick.create_prefsjs(crash / f"{idx}.js", variant="v1")
+        ppick.create_prefsjs(no_crash / f"{idx}.js")
+    argv = ["stats", str(yml), "--crash", str(crash), "--no-crash", str(no_crash)]
+    assert main([*argv, "--pairs", "--workers", "1"]) == 0
+    assert "Loaded 20 configurations" in caplog.text
+    assert "test.b=3: 10/10 crashed" in caplog.text
+    # invalid prefs.js files are skipped
+    caplog.clear()
+    (crash / "bad.js").write_text("bad")
+    assert main(argv) == 0
+    assert f"Skipping '{crash / 'bad.js'}': invalid prefs.js entry" in caplog.text
+    assert "Loaded 20 configurations (1 invalid skipped)" in caplog.text
+    # invalid template
+    yml.write_text("{-{")
+    assert main(argv) == 1
+    # missing --crash
+    with raises(SystemExit):
+        main(["stats", str(yml), "--no-crash", str(no_crash)])
+    assert "--crash is required" in capsys.readouterr()[1]
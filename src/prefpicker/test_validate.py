@@ -0,0 +1,98 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+"""validate.py tests"""
+
+from json import loads
+
+from pytest import importorskip, mark, raises
+
+from .main import main
+from .validate import find_templates, validate_template, validate_templates
+
+TEMPLATE = """
+variant: [v1]
+pref:
+  test.a:
+    variants: {default: [1, 2], v1: [1, 1]}
+"""
+
+
+def test_validate_01(tmp_path):
+    """test validate_template()"""
+    yml = tmp_path / "test.yml"
+    yml.write_text(TEMPLATE)
+    result = validate_template(yml)
+    assert result["valid"]
+    assert not result["errors"]
+    assert result["prefs"] == 1
+    assert result["variants"] == ["default", "v1"]
+    assert result["checks"] == {
+        "combinations": {"default": 2, "v1": 2},
+        "duplicates": [["test.a", "v1"]],
+        "overwrites": [["test.a", "v1", 1], ["test.a", "v1", 1]],
+    }
+    # invalid template
+    yml.write_text("variant: []\npref: {test.a: {}}\n")
+    result = validate_template(yml)
+    assert not result["valid"]
+    assert result["errors"][-1] == "'test.a' is missing 'variants' dict"
+    assert "checks" not in result
+    # invalid YAML
+    yml.write_text("{-{")
+    assert validate_template(yml)["errors"] == ["invalid YAML"]
+    yml.write_text("pref: *undefined")
+    assert validate_template(yml)["errors"] == ["invalid YAML"]
+    # missing file
+    assert not validate_template(tmp_path / "missing.yml")["valid"]
+
+
+@mark.parametrize("workers", [1, 2])
+def test_validate_02(tmp_path, workers):
+    """test validate_templates()"""
+    (tmp_path / "b.yml").write_text(TEMPLATE)
+    (tmp_path / "a.yml").write_text("variant: []")
+    (tmp_path / "c.txt").touch()
+    templates = tuple(find_templates([tmp_path]))
+    assert [x.name for x in templates] == ["a.yml", "b.yml"]
+    results = list(validate_templates(templates, workers=workers))
+    assert [x["valid"] for x in results] == [False, True]
+    assert "pref group is missing" in results[0]["errors"]
+
+
+def test_validate_03(tmp_path):
+    """test schema checks"""
+    importorskip("jsonschema")
+    yml = tmp_path / "test.yml"
+    yml.write_text(TEMPLATE)
+    assert validate_template(yml)["schema"] is True
+    yml.write_text("variant: [1]\npref: {}\n")
+    result = validate_template(yml)
+    assert result["schema"] is False
+    assert result["errors"][0].startswith("schema: variant/0:")
+
+
+def test_validate_04(capsys, tmp_path):
+    """test main() validate command"""
+    # built-in templates
+    assert main(["validate", "--workers", "2"]) == 0
+    report = loads(capsys.readouterr()[0])
+    assert report["valid"]
+    assert "browser-fuzzing.yml" in {x["template"][-19:] for x in report["templates"]}
+    # report written to file
+    yml = tmp_path / "test.yml"
+    yml.write_text("variant: []")
+    output = tmp_path / "report.json"
+    assert main(["validate", str(yml), "-o", str(output)]) == 1
+    report = loads(output.read_text())
+    assert not report["valid"]
+    assert len(report["templates"]) == 1
+    # no templates found
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    assert main(["validate", str(empty)]) == 1
+    # invalid arguments
+    with raises(SystemExit):
+        main(["validate", str(tmp_path / "missing")])
+    with raises(SystemExit):
+        main(["validate", "--workers", "0"])
@@ -0,0 +1,210 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+"""prefpicker template validation"""
+
+from __future__ import annotations
+
+import sys
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from json import dumps, loads
+from logging import getLogger
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from yaml import YAMLError, safe_load
+
+from .main import check_minimum
+from .prefpicker import PrefPicker, SourceDataError
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable
+
+__author__ = "Tyson Smith"
+__credits__ = ["Tyson Smith"]
+
+LOG = getLogger(__name__)
+
+SCHEMA = Path(__file__).parent.resolve() / "templates" / "schema.json"
+
+
+@lru_cache(maxsize=1)
+def _schema_validator() -> Any:
+    """Create a validator for the template schema. The validator is created once
+    per process, jsonschema is only imported when it is needed.
+
+    Args:
+        None
+
+    Returns:
+        jsonschema validator or None if jsonschema is not available.
+    """
+    try:
+        # pylint: disable=import-outside-toplevel
+        from jsonschema import Draft7Validator
+    except ImportError:  # pragma: no cover
+        return None
+    return Draft7Validator(loads(SCHEMA.read_text()))
+
+
+def find_templates(paths: Iterable[Path]) -> Generator[Path]:
+    """Find template files. Directories are scanned (not recursively) for YAML
+    files.
+
+    Args:
+        paths: Files and directories to search.
+
+    Yields:
+        Template files.
+    """
+    for path in paths:
+        if path.is_dir():
+            for entry in sorted(path.iterdir()):
+                if entry.is_file() and entry.suffix.lower().endswith(".yml"):
+                    yield entry
+        else:
+            yield path
+
+
+def validate_template(path: Path) -> dict[str, Any]:
+    """Validate a template. The file is parsed once, the data is checked against
+    the schema (if jsonschema is available) and by PrefPicker.verify_data() and
+    the results of the PrefPicker.check_*() methods are collected.
+
+    Args:
+        path: Template file.
+
+    Returns:
+        Validation results.
+    """
+    result: dict[str, Any] = {
+        "template": str(path),
+        "valid": False,
+        "errors": [],
+        "schema": None,
+    }
+    try:
+        raw_prefs = safe_load(path.read_bytes())
+    except OSError as exc:
+        result["errors"].append(f"cannot read file: {exc.strerror}")
+        return result
+    except YAMLError:
+        result["errors"].append("invalid YAML")
+        return result
+    validator = _schema_validator()
+    if validator is not None:
+        schema_errors = sorted(
+            (
+                f"{'/'.join(str(x) for x in error.absolute_path) or '<root>'}:"
+                f" {error.message}"
+            )
+            for error in validator.iter_errors(raw_prefs)
+        )
+        result["schema"] = not schema_errors
+        result["errors"].extend(f"schema: {x}" for x in schema_errors)
+    try:
+        picker = PrefPicker.from_data(raw_prefs)
+    except SourceDataError as exc:
+        result["errors"].append(str(exc))
+        return result
+    result["prefs"] = len(picker.prefs)
+    result["variants"] = sorted(picker.variants)
+    result["checks"] = {
+        "combinations": dict(sorted(picker.check_combinations())),
+        "duplicates": [list(x) for x in picker.check_duplicates()],
+        "overwrites": [list(x) for x in picker.check_overwrites()],
+    }
+    result["valid"] = not result["errors"]
+    return result
+
+
+def validate_templates(
+    paths: Iterable[Path], workers: int | None = None
+) -> Generator[dict[str, Any]]:
+    """Validate templates in parallel. Results are yielded in the same order as
+       the given paths.
+
+    Args:
+        paths: Template files.
+        workers: Maximum number of worker processes (default is CPU count).
+
+    Yields:
+        Validation results of each template.
+    """
+    files = tuple(paths)
+    if workers == 1 or len(files) < 2:
+        for path in files:
+            yield validate_template(path)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(validate_template, files)
+
+
+def parse_args(argv: list[str] | None = None) -> Namespace:
+    """Handle argument parsing.
+
+    Args:
+        argv: Arguments from the user.
+
+    Returns:
+        Parsed and sanitized arguments.
+    """
+    parser = ArgumentParser(
+        description="Validate templates and report the results as JSON",
+        prog="prefpicker validate",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        type=Path,
+        help="Template files or directories containing templates"
+        " (default: built-in templates).",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=Path,
+        help="Save report to the given file (default: stdout).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Maximum number of processes used (default: CPU count).",
+    )
+    args = parser.parse_args(argv)
+    for path in args.paths:
+        if not path.exists():
+            parser.error(f"Cannot find '{path}'")
+    if args.output and not args.output.parent.is_dir():
+        parser.error(f"Output '{args.output.parent}' directory does not exist.")
+    check_minimum(parser, args, "workers")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Template validation entry point."""
+    args = parse_args(argv)
+    if args.paths:
+        templates = tuple(find_templates(args.paths))
+    else:
+        templates = tuple(sorted(PrefPicker.templates()))
+    if not templates:
+        LOG.error("No templates found")
+        return 1
+    if _schema_validator() is None:
+        LOG.warning("jsonschema is not installed, schema checks skipped")
+    results = list(validate_templates(templates, workers=args.workers))
+    report = dumps(
+        {"valid": all(x["valid"] for x in results), "templates": results},
+        indent=2,
+    )
+    if args.output:
+        args.output.write_text(f"{report}\n")
+    else:
+        sys.stdout.write(f"{report}\n")
+    for result in results:
+        if not result["valid"]:
+            LOG.error("%s: %s", result["template"], "; ".join(result["errors"]))
+    return 0 if all(x["valid"] for x in results) else 1